@@ -16,6 +16,7 @@ from discord.ext import commands, tasks
 
 from util.consts import Consts
 from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
 from lib.Reminder import Reminder, IntervalReminder
 from lib.CommunitySettings import CommunitySettings, CommunityAction
 import lib.input_parser
@@ -76,9 +77,9 @@ class NewReminderView(util.interaction.CustomView):
 
         # update reminder (or interval)
         if isinstance(self.reminder, IntervalReminder):
-            self.reminder = Connector.get_interval_by_id(self.reminder._id)
+            self.reminder = await AsyncConnector.get_interval_by_id(self.reminder._id)
         else:
-            self.reminder = Connector.get_reminder_by_id(self.reminder._id)
+            self.reminder = await AsyncConnector.get_reminder_by_id(self.reminder._id)
 
         # re-send this button menu
         if isinstance(self.message, discord.WebhookMessage):
@@ -93,11 +94,11 @@ class NewReminderView(util.interaction.CustomView):
     @discord.ui.button(emoji='🗑️', style=discord.ButtonStyle.danger)
     async def del_reminder(self, button: discord.ui.Button, interaction: discord.Interaction):
         eb_title = None
-        if Connector.delete_reminder(self.reminder._id):
+        if await AsyncConnector.delete_reminder(self.reminder._id):
             eb_title = 'Deleted the reminder'
             color = Consts.col_warn
             Analytics.reminder_deleted(Types.DeleteAction.DIRECT_BTN) 
-        elif Connector.delete_interval(self.reminder._id):
+        elif await AsyncConnector.delete_interval(self.reminder._id):
             eb_title = 'Deleted the reminder'
             color = Consts.col_warn
             Analytics.interval_deleted(Types.DeleteAction.DIRECT_BTN) 
@@ -184,9 +185,9 @@ class ReminderCreation(commands.Cog):
         
         
 
-        tz_str = Connector.get_timezone(instance_id)
-        auto_del_action = Connector.get_auto_delete(instance_id)
-        is_legacy = Connector.is_legacy_interval(instance_id)
+        tz_str = await AsyncConnector.get_timezone(instance_id)
+        auto_del_action = await AsyncConnector.get_auto_delete(instance_id)
+        is_legacy = await AsyncConnector.is_legacy_interval(instance_id)
 
         utcnow = datetime.utcnow()
         remind_at, info = lib.input_parser.parse(period, utcnow, tz_str)
@@ -252,7 +253,7 @@ class ReminderCreation(commands.Cog):
                 Analytics.reminder_creation_failed(Types.CreationFailed.INVALID_F_STR)  
                 return
             
-            elif not lib.permissions.check_user_permission(ctx.guild.id, ctx.author.roles, required_perms=CommunityAction(repeating=True)):
+            elif not await AsyncConnector.run(lib.permissions.check_user_permission, ctx.guild.id, ctx.author.roles, required_perms=CommunityAction(repeating=True)):
                 # make sure the user is allowed to create repeating reminders
                 return
 
@@ -328,12 +329,12 @@ class ReminderCreation(commands.Cog):
             rem.first_at = old_rem.at
             rem.rrules.append(str(rrule))
 
-            rem.at = rem.next_trigger(utcnow, tz_str=tz_str)
-            rem._id = Connector.add_interval(rem)
+            rem.at = await AsyncConnector.run(rem.next_trigger, utcnow, tz_str=tz_str)
+            rem._id = await AsyncConnector.add_interval(rem)
             Analytics.reminder_created(rem, country_code=self.timezone_country.get(tz_str, 'UNK'), direct_interval=True)
         else:
             # the id is required in case the users wishes to abort
-            rem._id = Connector.add_reminder(rem)
+            rem._id = await AsyncConnector.add_reminder(rem)
             Analytics.reminder_created(rem, country_code=self.timezone_country.get(tz_str, 'UNK'))
 
 
@@ -401,7 +402,7 @@ class ReminderCreation(commands.Cog):
         if ctx.guild:
              # only allow execution if all permissions are present        
             action = CommunityAction(foreign=True, everyone=is_everyone)
-            err_eb = lib.permissions.get_missing_permissions_embed(ctx.guild.id, ctx.author.roles, required_perms=action)
+            err_eb = await AsyncConnector.run(lib.permissions.get_missing_permissions_embed, ctx.guild.id, ctx.author.roles, required_perms=action)
             if err_eb:
                 await ctx.respond(embed=err_eb)
                 return
@@ -420,7 +421,7 @@ class ReminderCreation(commands.Cog):
         channel = None
         if ctx.guild:
             # call will fail if community mode is enabled
-            err_eb = lib.permissions.get_missing_permissions_embed(ctx.guild.id, ctx.author.roles)
+            err_eb = await AsyncConnector.run(lib.permissions.get_missing_permissions_embed, ctx.guild.id, ctx.author.roles)
             if err_eb:
                 await ctx.respond(embed=err_eb)
                 return
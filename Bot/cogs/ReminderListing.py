@@ -10,6 +10,7 @@ import discord
 from discord.ext import commands, tasks
 
 from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
 from lib.Reminder import Reminder, IntervalReminder
 import lib.input_parser
 
@@ -66,7 +67,7 @@ class ReminderListView(util.interaction.CustomView):
 
 
     def update_dropdown(self):
-        self.stm.reminders = Connector.get_scoped_reminders(self.stm.scope)
+        # the reminders are loaded by the caller
         page_rems = self.get_reminders_on_page(self.stm.reminders, self.stm.page)
 
         if(len(page_rems) > 25):
@@ -136,6 +137,7 @@ class ReminderListView(util.interaction.CustomView):
         if int(sel) >= len(page_rems):
             # list is not long enough anymore
             # update ui to show shorter list
+            self.stm.reminders = await AsyncConnector.get_scoped_reminders(self.stm.scope)
             new_eb = self.get_embed()
             self.update_dropdown()
             await interaction.edit_original_message(embed=new_eb, view=self) # already responded
@@ -152,7 +154,7 @@ class ReminderListView(util.interaction.CustomView):
         self.message = view.message # update in case it was transferred
 
         # update reminder list and dropdown
-        self.stm.reminders = Connector.get_scoped_reminders(self.stm.scope)
+        self.stm.reminders = await AsyncConnector.get_scoped_reminders(self.stm.scope)
         self.update_dropdown()
         new_eb = self.get_embed()
         await self.message.edit_original_message(embed=new_eb, view=self) # already responded
@@ -271,7 +273,7 @@ class ReminderListing(commands.Cog):
 
     async def reminder_stm(self, stm: util.reminderInteraction.STM):
         # first fetch of reminders
-        stm.reminders = Connector.get_scoped_reminders(stm.scope)
+        stm.reminders = await AsyncConnector.get_scoped_reminders(stm.scope)
 
         # manually send initial message to init view
         view = ReminderListView(stm)
@@ -292,7 +294,7 @@ class ReminderListing(commands.Cog):
             scope = Connector.Scope(is_private=True, user_id=ctx.author.id)
 
         stm = util.reminderInteraction.STM(ctx=ctx, scope=scope)
-        stm.tz_str = Connector.get_timezone(scope.instance_id)
+        stm.tz_str = await AsyncConnector.get_timezone(scope.instance_id)
         await self.reminder_stm(stm)
 
 def setup(client):
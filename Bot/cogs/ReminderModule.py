@@ -1,5 +1,8 @@
+import os
 import asyncio
 import re
+import math
+import random
 import logging
 import traceback
 
@@ -15,7 +18,13 @@ import discord
 from discord.ext import commands, tasks
 
 from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
 from lib.Reminder import Reminder, IntervalReminder
+from lib.Scheduler import Scheduler
+from lib.DeliveryPool import DeliveryPool
+from lib.RateLimiter import RateLimiter
+from lib.LeaderElection import LeaderElection
+from lib.Resolver import Resolver
 import lib.input_parser
 import lib.ReminderRepeater
 import util.interaction
@@ -26,6 +35,48 @@ from lib.Analytics import Analytics, Types
 
 log = logging.getLogger('Remindme.Core')
 
+# max number of reminders claimed with a single query
+CLAIM_BATCH_SIZE = int(os.getenv('REMINDER_CLAIM_BATCH', '100'))
+# claimed reminders are returned to the queue, if not acknowledged within this time
+CLAIM_LEASE_SECS = int(os.getenv('REMINDER_LEASE_SECS', '300'))
+# reminders elapsed within this many seconds are delivered before older ones during a catch-up
+CATCHUP_FRESH_SECS = int(os.getenv('CATCHUP_FRESH_SECS', '300'))
+# the backlog is counted at most this often during a catch-up, estimated in between
+CATCHUP_COUNT_SECS = 60
+# trigger times up to this many seconds ahead are kept in memory
+SCHEDULER_WINDOW = int(os.getenv('SCHEDULER_WINDOW', '600'))
+# interval of the sweep loading the window, must be shorter than the window
+# reminders created by other processes can be delayed by up to this interval
+SCHEDULER_REFILL = int(os.getenv('SCHEDULER_REFILL', '60'))
+# if nothing is due within the window, the sweep is delayed until the next due reminder
+# enters the window, but at most by this interval
+SCHEDULER_IDLE_REFILL = int(os.getenv('SCHEDULER_IDLE_REFILL', '180'))
+# the scheduler re-evaluates the heap at least this often
+SCHEDULER_MAX_SLEEP = int(os.getenv('SCHEDULER_MAX_SLEEP', '60'))
+# running deliveries are cancelled after this many seconds on shutdown
+# must be shorter than the grace period of the container runtime
+DRAIN_TIMEOUT = int(os.getenv('DRAIN_TIMEOUT', '20'))
+# discord allows up to 10 embeds per message
+COALESCE_MAX_EMBEDS = 10
+# max number of reminders delivered at the same time
+DELIVERY_CONCURRENCY = int(os.getenv('DELIVERY_CONCURRENCY', '10'))
+# failed reminders are retried with exponential backoff
+# retries are aligned to slots of RETRY_SLOT_SECS, to be claimed in batches
+RETRY_MAX_ATTEMPTS = int(os.getenv('RETRY_MAX_ATTEMPTS', '5'))
+RETRY_BASE_SECS = int(os.getenv('RETRY_BASE_SECS', '30'))
+RETRY_MAX_SECS = int(os.getenv('RETRY_MAX_SECS', '3600'))
+RETRY_SLOT_SECS = int(os.getenv('RETRY_SLOT_SECS', '15'))
+# (rate per second, burst) of the send routes
+# channels and DM channels allow 5 messages per 5 seconds,
+# 'dm_all' limits the DMs opened across all users
+ROUTE_LIMITS = {
+    'channel': (1.0, 5),
+    'dm': (1.0, 5),
+    'dm_all': (float(os.getenv('RATE_LIMIT_DM', '5')), 5),
+}
+# discord allows 50 requests per second per bot, keep some headroom for commands
+GLOBAL_LIMIT = (float(os.getenv('RATE_LIMIT_GLOBAL', '40')), 40)
+
 class ReminderModule(commands.Cog):
 
 
@@ -37,12 +88,26 @@ class ReminderModule(commands.Cog):
     def __init__(self, client):
         self.client: discord.AutoShardedBot = client
 
+        # new and edited trigger times are pushed by the Connector
+        self.scheduler = Scheduler()
+        Connector.scheduler = self.scheduler
+        self.delivery_pool = DeliveryPool(DELIVERY_CONCURRENCY)
+        self.rate_limiter = RateLimiter(ROUTE_LIMITS, GLOBAL_LIMIT)
+        # keeps a reference to the running background refills
+        self.refill_tasks = set()
+
+        # claimed reminders and rescheduled intervals, which weren't delivered yet
+        # returned to the queue if the bot shuts down before the delivery
+        self.draining = False
+        self.unsent_reminders = {}
+        self.unsent_intervals = {}
+
         log.debug('starting reminder event loops')
 
-        if not self.check_pending_reminders.is_running():
-            self.check_pending_reminders.start()
-        if not self.check_pending_intervals.is_running():
-            self.check_pending_intervals.start()
+        if not self.refill_scheduler.is_running():
+            self.refill_scheduler.start()
+        if not self.run_scheduler.is_running():
+            self.run_scheduler.start()
         if not self.check_reminder_cnt.is_running():
             self.check_reminder_cnt.start()
         if not self.check_interval_cnt.is_running():
@@ -52,16 +117,96 @@ class ReminderModule(commands.Cog):
 
     def cog_unload(self):
         log.debug('stopping reminder event loops')
-        self.check_pending_reminders.cancel()
-        self.check_pending_intervals.cancel()
+        self.run_scheduler.cancel()
+        self.refill_scheduler.cancel()
+        Connector.scheduler = None
         self.check_reminder_cnt.cancel()
         self.check_interval_cnt.cancel()
         self.clean_interval_orphans.cancel()
-        
-        
+
+
+    async def drain(self, timeout: float=DRAIN_TIMEOUT):
+        """stop claiming new reminders and wait for the running deliveries
+           deliveries exceeding the timeout are cancelled,
+           all undelivered reminders are returned to the queue with their original trigger time
+           and checkpointed, the next start delivers them first
+
+        Args:
+            timeout (float, optional): max seconds to wait for running deliveries. Defaults to DRAIN_TIMEOUT.
+        """
+
+        if self.draining:
+            return
+
+        self.draining = True
+        log.info('draining reminder deliveries')
+
+        self.refill_scheduler.cancel()
+        for task in self.refill_tasks:
+            # the next delivery recalculates missing occurrences
+            task.cancel()
+
+        # finish the current pass, the scheduler doesn't start a new one while draining
+        self.run_scheduler.stop()
+        self.scheduler.wake()
+
+        task = self.run_scheduler.get_task()
+        if task and not task.done():
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if not done:
+                log.warning(f'deliveries didn\'t finish within {timeout}s, cancelling')
+                task.cancel()
+                await asyncio.wait({task})
+
+        reminder_ids = list(self.unsent_reminders)
+        intervals = [(i_id, at, due_at) for i_id, (at, due_at) in self.unsent_intervals.items()]
+
+        released = restored = 0
+        try:
+            if reminder_ids:
+                released = await AsyncConnector.release_reminders(reminder_ids)
+            if intervals:
+                restored = await AsyncConnector.restore_interval_at(intervals)
+            await AsyncConnector.save_checkpoint(reminder_ids, [i[0] for i in intervals])
+        except Exception as e:
+            # the leases of the reminders expire eventually
+            log.error(f'failed to return undelivered reminders. See exception below')
+            t = (type(e), e, e.__traceback__)
+            log.error(''.join(traceback.format_exception(*t)))
+            Analytics.register_exception(e)
+        else:
+            log.info(f'drained, returned {released} reminder(s) and {restored} interval(s) to the queue')
+
+        self.unsent_reminders.clear()
+        self.unsent_intervals.clear()
+
+
+    async def deliver_checkpoint(self):
+        """deliver the reminders left undelivered by the last shutdown,
+           before the scheduler processes any other reminder
+        """
+
+        reminder_ids, interval_ids = await AsyncConnector.take_checkpoints()
+        if not reminder_ids and not interval_ids:
+            return
+
+        log.info(f'delivering {len(reminder_ids)} reminder(s) and {len(interval_ids)} interval(s) of the last shutdown')
+
+        # reminders claimed or delivered by other workers in the meantime are skipped
+        pending_rems = await AsyncConnector.claim_reminders(reminder_ids, lease_secs=CLAIM_LEASE_SECS)
+        self.unsent_reminders.update((r._id, r) for r in pending_rems)
+        await self.run_deliveries(pending_rems, self.deliver_reminder, self.ack_delivered)
+
+        if interval_ids:
+            # the restored intervals are elapsed and part of the next pass
+            await self.check_pending_intervals()
+
+
     async def warn_author_dm(self, rem: Reminder, reason, channel:discord.TextChannel=None, err_msg=None):
-        
-        if rem.author == rem.target:
+
+        # a dead lettered reminder never reached its target
+        # even self-reminders must be notified about it
+        if rem.author == rem.target and reason != Types.DeliverFailureReason.RETRIES_EXHAUSTED:
             # nothing be done here
             # dm already failed before, 
             # only convert reason from target->author
@@ -78,16 +223,15 @@ class ReminderModule(commands.Cog):
 
 
         # try to notify the author of the reminder
-        try:
-            author = await self.client.fetch_user(rem.author)
-        except discord.errors.NotFound:
+        author = await Resolver.fetch_user(self.client, rem.author)
+        if not author:
             # expose second counter for author warn failed
             log.warning(f'cannot find user {rem.author} for author warning')
             Analytics.reminder_not_delivered(rem, Types.DeliverFailureReason.AUTHOR_FETCH)
             return
         
         guild = self.client.get_guild(rem.g_id) if rem.g_id else None
-        dm =  await author.create_dm()
+        dm = await Resolver.get_dm_channel(self.client, author)
         eb = rem.get_info_embed()
 
         guild_name = guild.name if guild else '*Unresolved Guild*'
@@ -98,6 +242,10 @@ class ReminderModule(commands.Cog):
                     '• or make sure the receiver allows to receive DMs from me\n'\
                     '• or edit the Reminder to be send into an existing channel'
         
+        if reason == Types.DeliverFailureReason.RETRIES_EXHAUSTED:
+            help_text = 'Couldn\'t deliver the reminder\n\n'\
+                        'Discord didn\'t accept the message, the reminder was removed'
+
         eb_warn = discord.Embed(title='Failed to deliver Reminder',
                                 description=f'{help_text}',
                                 color=Consts.col_crit)
@@ -114,84 +262,264 @@ class ReminderModule(commands.Cog):
 
 
     async def print_reminder_dm(self, rem: Reminder, channel=None, err_msg=None):
+        """deliver the reminder as DM to the target
+
+        Returns:
+            str: 'dm' if delivered, None if the author was warned instead
+        """
         # fallback to dm
         # target must be resolved, otherwise dm cannot be created
 
-        try:
-            target = await self.client.fetch_user(rem.target)
-        except discord.errors.NotFound:
+        with Analytics.delivery_stage('resolve', rem, 'dm'):
+            target = await Resolver.fetch_user(self.client, rem.target)
+
+            # dm if channel not existing anymor
+            dm = await Resolver.get_dm_channel(self.client, target) if target and not target.bot else None
+
+        if not target:
             log.warning(f'cannot find user {rem.target} for reminder DM')
             await self.warn_author_dm(rem, Types.DeliverFailureReason.TARGET_FETCH, channel=channel, err_msg=err_msg)
-            return
+            return None
 
         if target.bot:
             await self.warn_author_dm(rem, Types.DeliverFailureReason.TARGET_IS_BOT, channel=channel, err_msg=err_msg)
-            return
-
-        # dm if channel not existing anymor
-        dm = await target.create_dm()
+            return None
         
         
-        # respect user preferences
-        rem_type = Connector.get_reminder_type(rem.target)
-        
-        if rem_type == Connector.ReminderType.TEXT_ONLY:
-            # text is identical to missing permission fallback
-            # but the spoiler asking for more permissions is missing
-            eb = None
-            text = await rem.get_string(client=self.client, is_dm=True)
-        elif rem_type == Connector.ReminderType.EMBED_ONLY:
-            eb = await rem.get_embed(self.client, is_dm=True)
-            text = ''
-        else:
-            eb = await rem.get_embed(self.client, is_dm=True)
-            text = rem.get_embed_text(is_dm=True)
-        
-        view = util.interaction.UndeliveredView(reminder_id=rem._id, timeout=300)
+        with Analytics.delivery_stage('render', rem, 'dm'):
+            # respect user preferences
+            rem_type = await AsyncConnector.get_reminder_type(rem.target)
+            
+            if rem_type == Connector.ReminderType.TEXT_ONLY:
+                # text is identical to missing permission fallback
+                # but the spoiler asking for more permissions is missing
+                eb = None
+                text = await rem.get_string(client=self.client, is_dm=True)
+            elif rem_type == Connector.ReminderType.EMBED_ONLY:
+                eb = await rem.get_embed(self.client, is_dm=True)
+                text = ''
+            else:
+                eb = await rem.get_embed(self.client, is_dm=True)
+                text = rem.get_embed_text(is_dm=True)
+            
+            view = util.interaction.ReminderButtons.get_undelivered_view(rem._id)
 
         # first fallback is string-only message
         # second fallback is dm to user
         # DM never requires user mention (DM itself is a ping)
         try:
-            await dm.send(text, embed=eb, view=view)
-            if err_msg:
-                await dm.send(f'||{err_msg}||')
+            await self._rate_limit('dm', [('dm', rem.target), ('dm_all', None)])
+
+            with Analytics.delivery_stage('send', rem, 'dm'):
+                await dm.send(text, embed=eb, view=view)
         except discord.errors.Forbidden:
             # embeds can't be forbidden in DMs
             log.warning(f'failed to send reminder as DM to {rem.target}')
             await self.warn_author_dm(rem, Types.DeliverFailureReason.TARGET_DM, channel=channel, err_msg=err_msg)
+            return None
+
+        # the reminder is delivered, a failure from here on mustn't cause a retry
+        try:
+            util.interaction.ReminderButtons.release(view)
+            if err_msg:
+                await dm.send(f'||{err_msg}||')
+        except Exception as e:
+            log.warning(f'failed to send the fallback notice of reminder {rem._id}: {e}')
+
+        return 'dm'
+
+
+    async def _rate_limit(self, route_type: str, routes: list):
+        Analytics.delivery_queued(route_type, 1)
+        try:
+            waited = await self.rate_limiter.acquire(routes)
+        finally:
+            Analytics.delivery_queued(route_type, -1)
+
+        Analytics.delivery_wait(route_type, waited)
+
+
+    @staticmethod
+    def _delivery_key(rem: Reminder):
+        # reminders into the same channel or DM keep their order
+        return rem.ch_id if rem.g_id else f'dm-{rem.target}'
+
+
+    @staticmethod
+    def _retry_delay(attempts: int) -> float:
+        # jitter spreads the retries of a larger outage across multiple slots
+        delay = min(RETRY_MAX_SECS, RETRY_BASE_SECS * 2**attempts) * random.uniform(0.5, 1.0)
+
+        now_ts = datetime.utcnow().timestamp()
+        return math.ceil((now_ts + delay) / RETRY_SLOT_SECS) * RETRY_SLOT_SECS - now_ts
+
+
+    @staticmethod
+    def _is_transient(e: Exception) -> bool:
+        # server errors, exceeded rate limits and connection failures can succeed later
+        # any other error fails the same way on every attempt
+        if isinstance(e, discord.errors.HTTPException):
+            return e.status >= 500 or e.status == 429
+        return isinstance(e, (OSError, asyncio.TimeoutError))
+
+
+    async def _retry_or_dead_letter(self, rem: Reminder, e: Exception):
+        err = f'{type(e).__name__}: {e}'
+
+        if self._is_transient(e) and rem.attempts + 1 < RETRY_MAX_ATTEMPTS:
+            delay = self._retry_delay(rem.attempts)
+            await AsyncConnector.retry_reminder(rem._id, delay, err)
+            log.info(f'reminder {rem._id} failed (attempt {rem.attempts + 1}), retry in {delay:.0f}s')
             return
 
+        await AsyncConnector.dead_letter_reminder(rem, err)
+        log.warning(f'reminder {rem._id} failed {rem.attempts + 1} time(s), moved to dead letters')
+
+        try:
+            await self.warn_author_dm(rem, Types.DeliverFailureReason.RETRIES_EXHAUSTED)
+        except discord.errors.HTTPException as warn_e:
+            log.warning(f'failed to notify the author of dead lettered reminder {rem._id}: {warn_e}')
+
+
+    def _on_delivery_error(self, rem: Reminder, e: Exception):
+        log.error(f'reminder {rem._id} not delivered, skipping. See exception below')
+        t = (type(e), e, e.__traceback__)
+        log.error(''.join(traceback.format_exception(*t)))
+        Analytics.register_exception(e) # add these to ex counter
+        Analytics.reminder_delivery_failed(rem, e)
+
+
+    async def group_coalesced(self, rems: list) -> list:
+        """group the reminders of guilds with enabled coalescing by their channel
+
+        Returns:
+            list: list of reminder lists, each list is delivered as a single message
+        """
+
+        guild_ids = {r.g_id for r in rems if r.g_id}
+        settings = await AsyncConnector.get_settings_many(guild_ids) if guild_ids else {}
+
+        # dicts keep the insertion order, the delivery order is preserved
+        groups = {}
+        for i, rem in enumerate(rems):
+            if rem.g_id and settings[rem.g_id].get('coalesce', False):
+                key = (rem.g_id, rem.ch_id)
+            else:
+                key = i
+            groups.setdefault(key, []).append(rem)
+
+        return [g[i:i+COALESCE_MAX_EMBEDS] for g in groups.values() for i in range(0, len(g), COALESCE_MAX_EMBEDS)]
+
+
+    async def run_deliveries(self, rems: list, deliver, delivered):
+        """deliver the reminders through the delivery pool
+           merged reminders which can't be sent as a single message are delivered individually
+
+        Args:
+            rems (list): reminders due in this tick
+            deliver (Callable): coroutine function delivering a single reminder
+            delivered (Callable): coroutine function called with every reminder of a merged message and its route
+        """
+
+        groups = await self.group_coalesced(rems)
+
+        async def deliver_group(group):
+            if len(group) > 1 and await self.print_coalesced(group):
+                for rem in group:
+                    await delivered(rem, 'channel')
+                return
+
+            for rem in group:
+                # a failing reminder doesn't affect the remaining ones
+                try:
+                    await deliver(rem)
+                except Exception as e:
+                    self._on_delivery_error(rem, e)
+
+        await self.delivery_pool.run(groups, deliver_group, key=lambda g: self._delivery_key(g[0]),
+                                     on_error=lambda g, e: self._on_delivery_error(g[0], e))
+
+
+    async def print_coalesced(self, rems: list) -> bool:
+        """deliver reminders of the same channel as a single message with one embed each
+           merged reminders have no snooze or delete buttons,
+           the buttons of up to 10 reminders exceed the 25 components of a message
+
+           any failure falls back to the individual delivery,
+           which retries or dead letters each reminder on its own
+
+        Returns:
+            bool: True if delivered, False if the reminders must be delivered individually
+        """
+
+        try:
+            return await self._print_coalesced(rems)
+        except Exception as e:
+            # e.g. the combined embeds exceed the size limit or a lookup failed
+            log.debug(f'failed to send {len(rems)} merged reminders, sending individually: {type(e).__name__}: {e}')
+            return False
+
+
+    async def _print_coalesced(self, rems: list) -> bool:
+        rem = rems[0]
+
+        with Analytics.delivery_stage('resolve', rem, 'channel'):
+            guild = self.client.get_guild(rem.g_id)
+            channel = guild.get_channel_or_thread(rem.ch_id) if guild else None
+
+        # the individual delivery handles all fallbacks
+        if rem.ch_dead or not channel or isinstance(channel, discord.CategoryChannel) or not VerboseErrors.can_embed(channel, cached=True):
+            return False
+
+        with Analytics.delivery_stage('render', rem, 'channel'):
+            rem_type = await AsyncConnector.get_reminder_type(guild.id)
+            if rem_type != Connector.ReminderType.EMBED_ONLY and rem_type != Connector.ReminderType.HYBRID:
+                return False
+
+            embeds = [await r.get_embed(self.client) for r in rems]
+            mentions = dict.fromkeys(r.target_mention or f'<@{r.target}>' for r in rems)
+            text = ' '.join(mentions)
+
+        await self._rate_limit('channel', [('channel', channel.id)])
+
+        with Analytics.delivery_stage('send', rem, 'channel'):
+            await channel.send(text, embeds=embeds, allowed_mentions=discord.AllowedMentions.all())
+
+        return True
+
 
     async def print_reminder(self, rem: Reminder):
+        """deliver the reminder into its channel, falls back to a DM
+
+        Returns:
+            str: 'channel' or 'dm' depending on the delivery, None if the reminder couldn't be delivered
+        """
 
         async def send_message(guild, channel, text, embed, rem_type: Connector.ReminderType):
-            if VerboseErrors.can_embed(channel):
+            if VerboseErrors.can_embed(channel, cached=True):
                 try:
                     if rem_type != Connector.ReminderType.EMBED_ONLY and \
                         rem_type != Connector.ReminderType.HYBRID:
                         view = None
-                    elif isinstance(rem, IntervalReminder):                        
-                        view = util.interaction.SnoozeIntervalView(rem, timeout=500)
                     else:
-                        view = util.interaction.SnoozeView(rem, timeout=500)
+                        view = util.interaction.ReminderButtons.get_view(rem)
 
 
-                    tmp_msg = await channel.send(text, embed=embed, 
+                    await channel.send(text, embed=embed, 
                                     allowed_mentions=discord.AllowedMentions.all(),
                                     view=view)
 
-                    if view:
-                        # for timeout functionality
-                        view.message = tmp_msg
-                                    
+                    # the buttons are stateless and handled by on_interaction
+                    util.interaction.ReminderButtons.release(view)
                     return True
                 except discord.errors.Forbidden:
                     if isinstance(channel, discord.Thread) and channel.locked:
                         return False # no error on locked threads
                     log.error('failed to send embed, even though permissions had been assured')
+                    # the cached permissions are outdated
+                    VerboseErrors.invalidate_guild_permissions(channel.guild.id)
 
-            elif VerboseErrors.can_send_messages(channel):
+            elif VerboseErrors.can_send_messages(channel, cached=True):
                 try:
                     # get the reminder string
                     # ignoring the user preferences
@@ -203,23 +531,22 @@ class ReminderModule(commands.Cog):
                     if isinstance(channel, discord.Thread) and channel.locked:
                         return False # no error on locked threads
                     log.error('failed to send text message, even though permissions had been assured')
+                    VerboseErrors.invalidate_guild_permissions(channel.guild.id)
 
             return False
 
     
         # reminder is a DM reminder
         if not rem.g_id:
-            await self.print_reminder_dm(rem)
-            return
+            return await self.print_reminder_dm(rem)
 
-        guild = self.client.get_guild(rem.g_id)
-        channel = guild.get_channel_or_thread(rem.ch_id) if guild else None
+        with Analytics.delivery_stage('resolve', rem, 'channel'):
+            guild = self.client.get_guild(rem.g_id)
 
-        if not channel:
-            # this gets archived threads
-            try:
-                channel = await self.client.fetch_channel(rem.ch_id)
-            except (discord.errors.NotFound, discord.errors.Forbidden):
+            # dead channels were deleted, no need to resolve them again
+            if guild and not rem.ch_dead:
+                channel = await Resolver.get_channel(self.client, guild, rem.ch_id)
+            else:
                 channel = None
 
 
@@ -236,29 +563,32 @@ class ReminderModule(commands.Cog):
         
         if err:
             log.debug('try to send reminder over dm')
-            await self.print_reminder_dm(rem, channel=None, err_msg=err)
-            return
+            return await self.print_reminder_dm(rem, channel=None, err_msg=err)
 
-        # respect guild preferences
-        rem_type = Connector.get_reminder_type(guild.id)
-        
+        with Analytics.delivery_stage('render', rem, 'channel'):
+            # respect guild preferences
+            rem_type = await AsyncConnector.get_reminder_type(guild.id)
+            
 
-        if rem_type == Connector.ReminderType.BAREBONE:
-            eb = None
-            text = await rem.get_string(client=self.client, barebone=True)
-        elif rem_type == Connector.ReminderType.TEXT_ONLY:
-            # text is identical to missing permission fallback
-            # but the spoiler asking for more permissions is missing
-            eb = None
-            text = await rem.get_string(client=self.client, barebone=False)
-        elif rem_type == Connector.ReminderType.EMBED_ONLY:
-            eb = await rem.get_embed(self.client)
-            text = rem.target_mention or f'<@{rem.target}>'
-        else:
-            eb = await rem.get_embed(self.client)
-            text = rem.get_embed_text()
+            if rem_type == Connector.ReminderType.BAREBONE:
+                eb = None
+                text = await rem.get_string(client=self.client, barebone=True)
+            elif rem_type == Connector.ReminderType.TEXT_ONLY:
+                # text is identical to missing permission fallback
+                # but the spoiler asking for more permissions is missing
+                eb = None
+                text = await rem.get_string(client=self.client, barebone=False)
+            elif rem_type == Connector.ReminderType.EMBED_ONLY:
+                eb = await rem.get_embed(self.client)
+                text = rem.target_mention or f'<@{rem.target}>'
+            else:
+                eb = await rem.get_embed(self.client)
+                text = rem.get_embed_text()
+
+        await self._rate_limit('channel', [('channel', channel.id)])
 
-        success = await send_message(guild, channel, text, eb, rem_type)
+        with Analytics.delivery_stage('send', rem, 'channel'):
+            success = await send_message(guild, channel, text, eb, rem_type)
         
 
         if not success:
@@ -269,7 +599,9 @@ class ReminderModule(commands.Cog):
             else:
                 err = f'`You are receiving this dm, as I do not have permission to send messages into the channel \'{channel.name}\' on \'{guild.name}\'.`'
 
-            await self.print_reminder_dm(rem, channel=channel, err_msg=err)
+            return await self.print_reminder_dm(rem, channel=channel, err_msg=err)
+
+        return 'channel'
 
     # =====================
     # events functions
@@ -282,58 +614,326 @@ class ReminderModule(commands.Cog):
         log.info('loaded')
 
 
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        # snooze and delete buttons of delivered reminders
+        if interaction.type == discord.InteractionType.component:
+            await util.interaction.ReminderButtons.dispatch(interaction)
+
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        # overwrites might have changed
+        VerboseErrors.invalidate_channel_permissions(after.id)
+
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel):
+        VerboseErrors.forget_channel(channel.id)
+
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild):
+        VerboseErrors.forget_guild(guild)
+
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        VerboseErrors.invalidate_guild_permissions(after.guild.id)
+
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        VerboseErrors.invalidate_guild_permissions(role.guild.id)
+
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        # only updates of the bot member are received without the members intent
+        if after.id == self.client.user.id:
+            VerboseErrors.invalidate_guild_permissions(after.guild.id)
+
+
     @tasks.loop(hours=24)
     async def clean_interval_orphans(self):
-        cnt = Connector.delete_orphaned_intervals()
+        if not LeaderElection.is_leader:
+            return
+
+        cnt = await AsyncConnector.delete_orphaned_intervals()
 
         Analytics.reminder_deleted(Types.DeleteAction.ORPHAN, count=cnt)
         log.debug(f'deleted {cnt} orphaned interval(s)')
 
 
-    @tasks.loop(seconds=45)
+    @tasks.loop(seconds=0)
+    async def refill_scheduler(self):
+        # the sweep interval depends on the loaded window,
+        # the loop sleeps itself instead of using a fixed interval
+        refill_in = SCHEDULER_REFILL
+
+        # a failed refill must not stop the loop
+        # the scheduler polls the db while the horizon is stale
+        try:
+            refill_in = await self.refill_window()
+        except Exception as e:
+            log.error(f'failed to refill the scheduler. See exception below')
+            t = (type(e), e, e.__traceback__)
+            log.error(''.join(traceback.format_exception(*t)))
+            Analytics.register_exception(e)
+
+        await asyncio.sleep(refill_in)
+
+
+    async def refill_window(self) -> float:
+        """load the trigger times of the next window into the scheduler
+
+        Returns:
+            float: seconds until the next sweep
+        """
+        now_ts = datetime.utcnow().timestamp()
+        horizon = now_ts + SCHEDULER_WINDOW
+
+        timestamps = await AsyncConnector.get_upcoming_at(horizon)
+        refill_in = SCHEDULER_REFILL
+
+        if not timestamps:
+            # idle, extend the window up to the next due reminder
+            # the scheduler sleeps until then and the sweep can pause meanwhile
+            next_at = await AsyncConnector.get_next_due_at(horizon)
+            if next_at is not None:
+                timestamps = [next_at]
+                horizon = next_at
+                refill_in = next_at - SCHEDULER_WINDOW - now_ts
+            else:
+                refill_in = SCHEDULER_IDLE_REFILL
+
+            refill_in = min(SCHEDULER_IDLE_REFILL, max(SCHEDULER_REFILL, refill_in))
+
+        self.scheduler.refill(timestamps, horizon)
+        return refill_in
+
+
+    @tasks.loop(seconds=0)
+    async def run_scheduler(self):
+        await self.scheduler.wait(datetime.utcnow().timestamp(), max_sleep=SCHEDULER_MAX_SLEEP)
+
+        if self.draining:
+            return
+
+        now_ts = datetime.utcnow().timestamp()
+        due = self.scheduler.pop_due(now_ts)
+
+        # without refills the heap misses new reminders,
+        # fall back to a pass every SCHEDULER_MAX_SLEEP
+        if not due and not self.scheduler.is_stale(now_ts):
+            return
+
+        # a failed pass must not stop the scheduler loop
+        # claimed reminders are returned to the queue once their lease expires
+        for check_pending in (self.check_pending_intervals, self.check_pending_reminders):
+            try:
+                await check_pending()
+            except Exception as e:
+                log.error(f'failed to process pending reminders. See exception below')
+                t = (type(e), e, e.__traceback__)
+                log.error(''.join(traceback.format_exception(*t)))
+                Analytics.register_exception(e)
+
+
     async def check_pending_intervals(self):
+        # paged, the backlog of a downtime isn't loaded at once
+        # a page is rescheduled before it's delivered and therefore not part of the next page
+        while not self.draining:
+            fetched, failed = await self.check_interval_page()
+            if fetched < CLAIM_BATCH_SIZE or failed == fetched:
+                break
+
+
+    async def check_interval_page(self) -> tuple:
+        """deliver a single page of elapsed intervals
+
+        Returns:
+            tuple: number of (fetched, not rescheduled) intervals
+        """
         now = datetime.utcnow()
         
-        pending_intvls = Connector.get_pending_intervals(now.timestamp())
+        with Analytics.delivery_stage('claim', IntervalReminder, 'any'):
+            pending_intvls = await AsyncConnector.get_pending_intervals(now.timestamp(), limit=CLAIM_BATCH_SIZE)
+        fetched = len(pending_intvls)
+
+        # the due date is overwritten by the next trigger
+        due_at = {i._id: i.at for i in pending_intvls}
 
         for interval in pending_intvls:
             # must be evaluated before new at is assigned
             Analytics.reminder_delay(interval, now=now, allowed_delay=2*60)
-            
-            interval.at = interval.next_trigger(now)
-            Connector.update_interval_at(interval)
-            
-        for interval in pending_intvls:
+
+        # single query for the settings of the whole batch
+        settings = await AsyncConnector.get_settings_many([i.g_id or i.author for i in pending_intvls])
+
+        def next_triggers():
+            for interval in pending_intvls:
+                instance_settings = settings[interval.g_id or interval.author]
+                interval.at = interval.next_trigger(now, tz_str=instance_settings.timezone, legacy_mode=instance_settings.legacy_interval)
+
+        await AsyncConnector.run(next_triggers)
+
+        # tracked before the update, a restore of a failed update doesn't match any interval
+        self.unsent_intervals.update((i._id, (i.at, due_at[i._id])) for i in pending_intvls)
+
+        # reschedule all intervals in a single round trip
+        failed = await AsyncConnector.bulk_update_interval_at(pending_intvls)
+        for interval_id, err in failed.items():
+            # the interval is still pending and is retried on the next tick
+            # delivering it now would send it twice
+            log.error(f'failed to reschedule interval {interval_id}, skipping delivery: {err}')
+            self.unsent_intervals.pop(interval_id, None)
+
+        pending_intvls = [i for i in pending_intvls if i._id not in failed]
+
+        async def delivered(interval, route):
+            self.unsent_intervals.pop(interval._id, None)
+            if route:
+                Analytics.reminder_delivered(interval, route, due_at[interval._id])
+
+        async def deliver(interval):
             try:
-                await self.print_reminder(interval)
-            except Exception as e:
-                log.error(f'interval not delivered, skipping. See exception below')
-                t = (type(e), e, e.__traceback__)
-                log.error(''.join(traceback.format_exception(*t)))
-                Analytics.register_exception(e) # add these to ex counter
+                route = await self.print_reminder(interval)
+            except Exception:
+                # not retried, the next occurrence is already scheduled
+                self.unsent_intervals.pop(interval._id, None)
+                raise
+
+            await delivered(interval, route)
+
+        await self.run_deliveries(pending_intvls, deliver, delivered)
+
+        # refill the precomputed occurrences without delaying the next delivery
+        low_intvls = [i for i in pending_intvls if i.needs_refill()]
+        if low_intvls:
+            task = asyncio.create_task(self.refill_upcoming(low_intvls))
+            self.refill_tasks.add(task)
+            task.add_done_callback(self.refill_tasks.discard)
 
         self.last_loop = datetime.utcnow()
         sent_in = (self.last_loop-now).total_seconds()
         if sent_in > 1:
             log.debug(f'intervals sent in {sent_in}s')
 
+        return fetched, len(failed)
+
+
+    async def refill_upcoming(self, intervals: list):
+        try:
+            for interval in intervals:
+                await AsyncConnector.run(interval.refill_upcoming)
+            await AsyncConnector.bulk_update_interval_upcoming(intervals)
+        except Exception as e:
+            # next_trigger calculates the occurrences on demand if the refill is missing
+            log.error(f'failed to refill interval occurrences. See exception below')
+            t = (type(e), e, e.__traceback__)
+            log.error(''.join(traceback.format_exception(*t)))
+            Analytics.register_exception(e)
+
+
+    async def deliver_reminder(self, reminder: Reminder):
+        """deliver a claimed reminder and acknowledge it,
+           deliveries failing with a transient error are retried,
+           other failures are dead lettered
+
+           print_reminder only raises if nothing was sent,
+           a reminder is never delivered twice by a retry
+        """
+
+        try:
+            route = await self.print_reminder(reminder)
+        except Exception as e:
+            await self._retry_or_dead_letter(reminder, e)
+            self.unsent_reminders.pop(reminder._id, None)
+            raise
+
+        await self.ack_delivered(reminder, route)
+
+
+    async def ack_delivered(self, reminder: Reminder, route: str):
+        if route:
+            Analytics.reminder_delivered(reminder, route, reminder.at)
+
+        await AsyncConnector.ack_reminder(reminder._id)
+        self.unsent_reminders.pop(reminder._id, None)
+        # measured at delivery, includes the time spent waiting for a worker
+        Analytics.reminder_delay(reminder, allowed_delay=1*60)
+
+
+    async def claim_catchup_page(self, now_ts: float) -> list:
+        """claim a page of the backlog, recently elapsed reminders jump ahead of stale ones
+           the remaining page is filled with the oldest reminders
+        """
+
+        pending_rems = await AsyncConnector.claim_elapsed_reminders(now_ts, limit=CLAIM_BATCH_SIZE, lease_secs=CLAIM_LEASE_SECS,
+                                                                    after_ts=now_ts - CATCHUP_FRESH_SECS)
+
+        if len(pending_rems) < CLAIM_BATCH_SIZE:
+            # the fresh reminders are leased already and not claimed twice
+            pending_rems += await AsyncConnector.claim_elapsed_reminders(now_ts, limit=CLAIM_BATCH_SIZE-len(pending_rems), lease_secs=CLAIM_LEASE_SECS)
+
+        return pending_rems
+
 
-    @tasks.loop(seconds=50)
     async def check_pending_reminders(self):
         now = datetime.utcnow()
 
-        pending_rems = Connector.pop_elapsed_reminders(now.timestamp())
-        
-        for reminder in pending_rems:
+        # a full page indicates a backlog (e.g. after a downtime)
+        # the remaining pages are claimed in catch-up mode
+        catchup_start = None
+        delivered = 0
+        backlog = 0
+        counted_at = None
+
+        # a draining bot finishes the claimed batch, but doesn't claim new ones
+        while not self.draining:
+            # the reminders are only deleted after the delivery attempt
+            # a crash will return the batch to the queue once the lease expires
+            with Analytics.delivery_stage('claim', Reminder, 'any'):
+                if catchup_start:
+                    pending_rems = await self.claim_catchup_page(datetime.utcnow().timestamp())
+                else:
+                    pending_rems = await AsyncConnector.claim_elapsed_reminders(now.timestamp(), limit=CLAIM_BATCH_SIZE, lease_secs=CLAIM_LEASE_SECS)
+
+            self.unsent_reminders.update((r._id, r) for r in pending_rems)
+            await self.run_deliveries(pending_rems, self.deliver_reminder, self.ack_delivered)
+            delivered += len(pending_rems)
+
+            if len(pending_rems) < CLAIM_BATCH_SIZE:
+                break
+
+            if not catchup_start:
+                catchup_start = now
+                log.info('reminder backlog detected, entering catch-up mode')
+
+            # counting scans the whole backlog, don't repeat it for every page
+            if not counted_at or (datetime.utcnow() - counted_at).total_seconds() >= CATCHUP_COUNT_SECS:
+                counted_at = datetime.utcnow()
+                backlog = await AsyncConnector.get_backlog_size(counted_at.timestamp())
+            else:
+                backlog = max(0, backlog - len(pending_rems))
+
+            rate = delivered / max(1, (datetime.utcnow() - catchup_start).total_seconds())
+            Analytics.reminder_backlog(backlog, backlog / rate)
+
+            # the scheduler is blocked until the catch-up finished,
+            # deliver the due intervals between the reminder pages
             try:
-                await self.print_reminder(reminder)
+                await self.check_interval_page()
             except Exception as e:
-                log.error(f'reminder not delivered, skipping. See exception below')
+                log.error(f'failed to process pending intervals during catch-up. See exception below')
                 t = (type(e), e, e.__traceback__)
                 log.error(''.join(traceback.format_exception(*t)))
-                Analytics.register_exception(e) # add these to ex counter
+                Analytics.register_exception(e)
 
-            Analytics.reminder_delay(reminder, now=now, allowed_delay=1*60)
+        if catchup_start:
+            log.info(f'caught up, delivered {delivered} reminder(s) of the backlog')
+            Analytics.reminder_backlog(0, 0)
 
 
         sent_in = (datetime.utcnow()-now).total_seconds()
@@ -344,34 +944,53 @@ class ReminderModule(commands.Cog):
    
     @tasks.loop(minutes=15)
     async def check_reminder_cnt(self):
-        rems = Connector.get_reminder_cnt()
+        if not LeaderElection.is_leader:
+            return
+
+        rems = await AsyncConnector.get_reminder_cnt()
         Analytics.reminder_cnt(rems)
 
     @tasks.loop(minutes=15)
     async def check_interval_cnt(self):
-        intvls = Connector.get_interval_cnt()
+        if not LeaderElection.is_leader:
+            return
+
+        intvls = await AsyncConnector.get_interval_cnt()
         Analytics.interval_cnt(intvls)
     
 
     @clean_interval_orphans.before_loop
     async def clean_interval_orphans_before(self):
         await self.client.wait_until_ready()
+        await LeaderElection.renew()
 
-    @check_pending_intervals.before_loop
-    async def check_pending_intervals_before(self):
+    @refill_scheduler.before_loop
+    async def refill_scheduler_before(self):
         await self.client.wait_until_ready()
 
-    @check_pending_reminders.before_loop
-    async def check_pending_reminders_before(self):
+    @run_scheduler.before_loop
+    async def run_scheduler_before(self):
         await self.client.wait_until_ready()
+        self.scheduler.bind(asyncio.get_running_loop())
+
+        try:
+            await self.deliver_checkpoint()
+        except Exception as e:
+            # the checkpointed reminders are elapsed, the regular passes deliver them
+            log.error(f'failed to deliver the checkpoint. See exception below')
+            t = (type(e), e, e.__traceback__)
+            log.error(''.join(traceback.format_exception(*t)))
+            Analytics.register_exception(e)
 
     @check_reminder_cnt.before_loop
     async def check_reminder_cnt_before(self):
         await self.client.wait_until_ready()
+        await LeaderElection.renew()
 
     @check_interval_cnt.before_loop
     async def check_interval_cnt_before(self):
         await self.client.wait_until_ready()
+        await LeaderElection.renew()
 
     # =====================
     # commands functions
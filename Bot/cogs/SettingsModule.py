@@ -20,6 +20,7 @@ from util.consts import Consts
 import lib.permissions
 import util.interaction
 from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
 from lib.CommunitySettings import CommunitySettings, CommunityAction
 from lib.Analytics import Analytics, Types
 
@@ -56,12 +57,15 @@ class CommunitySubSettings(util.interaction.CustomView):
     def __init__(self, scope: Connector.Scope, roles=[], *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.scope = scope
-        self.update_ui_elements()
-        
 
 
-    def update_ui_elements(self):
-        comm_settings = Connector.get_community_settings(self.scope.instance_id)
+    async def init(self):
+        """load the current settings, must be awaited before the view is sent"""
+        await self.update_ui_elements()
+
+
+    async def update_ui_elements(self):
+        comm_settings = await AsyncConnector.get_community_settings(self.scope.instance_id)
 
 
         if comm_settings.restrict_repeating:
@@ -129,7 +133,7 @@ class CommunitySubSettings(util.interaction.CustomView):
     
 
     async def send_update_ui(self, interaction: discord.Interaction):
-        self.update_ui_elements()
+        await self.update_ui_elements()
         await interaction.response.edit_message(view=self)
 
 
@@ -140,12 +144,12 @@ class CommunitySubSettings(util.interaction.CustomView):
 
     @discord.ui.button(label='Disabled', style=discord.ButtonStyle.secondary, row=0)
     async def mod_disabled(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_setting(self.scope.instance_id, 'mods_only', False)
+        await AsyncConnector.set_community_setting(self.scope.instance_id, 'mods_only', False)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Enabled', style=discord.ButtonStyle.secondary, row=0)
     async def mod_enabled(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_settings(self.scope.instance_id, CommunitySettings.full_restricted())
+        await AsyncConnector.set_community_settings(self.scope.instance_id, CommunitySettings.full_restricted())
         await self.send_update_ui(interaction)
 
 
@@ -156,12 +160,12 @@ class CommunitySubSettings(util.interaction.CustomView):
 
     @discord.ui.button(label='Everyone', style=discord.ButtonStyle.secondary, row=1)
     async def repeat_everyone(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_setting(self.scope.instance_id, 'restrict_repeating', False)
+        await AsyncConnector.set_community_setting(self.scope.instance_id, 'restrict_repeating', False)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Mods Only', style=discord.ButtonStyle.secondary, row=1)
     async def repeat_mods(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_setting(self.scope.instance_id, 'restrict_repeating', True)
+        await AsyncConnector.set_community_setting(self.scope.instance_id, 'restrict_repeating', True)
         await self.send_update_ui(interaction)
 
 
@@ -171,12 +175,12 @@ class CommunitySubSettings(util.interaction.CustomView):
         pass # do nothing when this one is pressed
     @discord.ui.button(label='Everyone', style=discord.ButtonStyle.secondary, row=2)
     async def mention_everyone(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_setting(self.scope.instance_id, 'restrict_everyone', False)
+        await AsyncConnector.set_community_setting(self.scope.instance_id, 'restrict_everyone', False)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Mods Only', style=discord.ButtonStyle.secondary, row=2)
     async def mention_mods(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_setting(self.scope.instance_id, 'restrict_everyone', True)
+        await AsyncConnector.set_community_setting(self.scope.instance_id, 'restrict_everyone', True)
         await self.send_update_ui(interaction)
 
 
@@ -187,12 +191,12 @@ class CommunitySubSettings(util.interaction.CustomView):
 
     @discord.ui.button(label='Everyone', style=discord.ButtonStyle.secondary, row=3)
     async def foreign_everyone(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_setting(self.scope.instance_id, 'restrict_foreign', False)
+        await AsyncConnector.set_community_setting(self.scope.instance_id, 'restrict_foreign', False)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Mods Only', style=discord.ButtonStyle.secondary, row=3)
     async def foreign_mods(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_setting(self.scope.instance_id, 'restrict_foreign', True)
+        await AsyncConnector.set_community_setting(self.scope.instance_id, 'restrict_foreign', True)
         await self.send_update_ui(interaction)
 
 
@@ -203,31 +207,44 @@ class CommunitySubSettings(util.interaction.CustomView):
         self.stop()
 
 class SettingsPageTemplate(util.interaction.CustomView):
-    def __init__(self, scope, page, page_callback, dropdown_row=4, roles=[], *args, **kwargs):
+    def __init__(self, scope, author, page, page_callback, dropdown_row=4, roles=[], *args, **kwargs):
 
         super().__init__(*args, **kwargs)
         self.scope:Connector.Scope = scope
+        self.author = author
+        self.forbidden = False
 
         self.dd = MenuDropdown(page_num=page, page_switch_callback=page_callback, row=dropdown_row)
         self.add_item(self.dd)
 
 
-
-class ExperimentalSettings(SettingsPageTemplate):
-    def __init__(self, scope, author: Union[discord.User, discord.Member], guild_roles: list[discord.Role], page_callback, *args, **kwargs):
-        super().__init__(scope=scope, page=2, page_callback=page_callback, dropdown_row=4, *args, **kwargs)
-        self.update_ui_elements()
+    async def init(self):
+        """load the current settings and the permissions of the author,
+           must be awaited before the view is sent
+        """
+        await self.update_ui_elements()
 
         action = CommunityAction(settings=True)
-        self.forbidden = not lib.permissions.check_user_permission(self.scope.instance_id, author.roles, required_perms=action)
+        self.forbidden = not await AsyncConnector.run(lib.permissions.check_user_permission, self.scope.instance_id, self.author.roles, required_perms=action)
 
-        if scope.is_private or (self.forbidden and not author.guild_permissions.administrator):
+        if self.scope.is_private or (self.forbidden and not self.author.guild_permissions.administrator):
             self.disable_all()
             self.dd.disabled = False
 
 
-    def update_ui_elements(self):
-        is_exp = Connector.is_experimental(self.scope.instance_id)
+    async def update_ui_elements(self):
+        pass
+
+
+
+class ExperimentalSettings(SettingsPageTemplate):
+    def __init__(self, scope, author: Union[discord.User, discord.Member], guild_roles: list[discord.Role], page_callback, *args, **kwargs):
+        super().__init__(scope=scope, author=author, page=2, page_callback=page_callback, dropdown_row=4, *args, **kwargs)
+
+
+    async def update_ui_elements(self):
+        is_exp = await AsyncConnector.is_experimental(self.scope.instance_id)
+        is_coalesce = await AsyncConnector.is_coalesce(self.scope.instance_id)
 
         if is_exp:
             self.exp_enabled.style=discord.ButtonStyle.success
@@ -240,12 +257,25 @@ class ExperimentalSettings(SettingsPageTemplate):
             self.exp_disabled.style=discord.ButtonStyle.success
             self.exp_disabled.disabled=True
 
+        if is_coalesce:
+            self.coalesce_enabled.style=discord.ButtonStyle.success
+            self.coalesce_enabled.disabled=True
+            self.coalesce_disabled.style=discord.ButtonStyle.secondary
+            self.coalesce_disabled.disabled=False
+        else:
+            self.coalesce_enabled.style=discord.ButtonStyle.secondary
+            self.coalesce_enabled.disabled=False
+            self.coalesce_disabled.style=discord.ButtonStyle.success
+            self.coalesce_disabled.disabled=True
+
 
     def get_embed(self) -> discord.Embed:
         eb = discord.Embed(title='Remindme Experimental-Settings',
                 description='Server Managers can enable experimental settings.\n'\
                             'These are new features which are not yet ready to be deployed for everyone.\n'\
-                            'Be aware that the Bot might not be as reliable with these turned on.')
+                            'Be aware that the Bot might not be as reliable with these turned on.\n\n'\
+                            '**Merge Reminders** sends reminders, which are due at the same time in the same channel, '\
+                            'as a single message. Merged reminders have no snooze or delete buttons.')
         
         if self.forbidden:
             eb.color = Consts.col_err
@@ -255,7 +285,7 @@ class ExperimentalSettings(SettingsPageTemplate):
     
 
     async def send_update_ui(self, interaction: discord.Interaction):
-        self.update_ui_elements()
+        await self.update_ui_elements()
         await interaction.response.edit_message(view=self)
 
     @discord.ui.button(label='Experimental Features', style=discord.ButtonStyle.primary, row=0)
@@ -264,12 +294,26 @@ class ExperimentalSettings(SettingsPageTemplate):
 
     @discord.ui.button(label='Disabled', style=discord.ButtonStyle.secondary, row=0)
     async def exp_disabled(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_experimental(self.scope.instance_id, False)
+        await AsyncConnector.set_experimental(self.scope.instance_id, False)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Enabled', style=discord.ButtonStyle.secondary, row=0)
     async def exp_enabled(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_experimental(self.scope.instance_id, True)
+        await AsyncConnector.set_experimental(self.scope.instance_id, True)
+        await self.send_update_ui(interaction)
+
+    @discord.ui.button(label='Merge Reminders', style=discord.ButtonStyle.primary, row=1)
+    async def coalesce_mode(self, button: discord.ui.Button, interaction: discord.Interaction):
+        pass # do nothing when this one is pressed
+
+    @discord.ui.button(label='Disabled', style=discord.ButtonStyle.secondary, row=1)
+    async def coalesce_disabled(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await AsyncConnector.set_coalesce(self.scope.instance_id, False)
+        await self.send_update_ui(interaction)
+
+    @discord.ui.button(label='Enabled', style=discord.ButtonStyle.secondary, row=1)
+    async def coalesce_enabled(self, button: discord.ui.Button, interaction: discord.Interaction):
+        await AsyncConnector.set_coalesce(self.scope.instance_id, True)
         await self.send_update_ui(interaction)
 
 
@@ -296,32 +340,29 @@ class RoleDropDown(discord.ui.Select):
     async def callback(self, interaction: discord.Interaction):
         self.mod_roles = list(map(int, self.values))
         log.debug(f'updated moderator count is {len(self.mod_roles)}')
-        Connector.set_moderators(self.scope.instance_id, self.mod_roles)
+        await AsyncConnector.set_moderators(self.scope.instance_id, self.mod_roles)
 
 
 class CommunitySettingsView(SettingsPageTemplate):
     def __init__(self, scope:Connector.Scope, author: Union[discord.User, discord.Member], guild_roles: list[discord.Role], page_callback, *args, **kwargs):
-        super().__init__(scope, page=1, page_callback=page_callback, dropdown_row=4, *args, **kwargs)
-        self.update_ui_elements()
+        super().__init__(scope, author=author, page=1, page_callback=page_callback, dropdown_row=4, *args, **kwargs)
 
         self.guild_roles = guild_roles
-        self.author = author
+        self.role_drop = None
 
-        mod_roles = Connector.get_moderators(self.scope.instance_id)
 
-        self.role_drop = RoleDropDown(scope=scope, author=self.author, guild_roles=self.guild_roles, mod_roles=mod_roles)
-        self.add_item(self.role_drop)
+    async def init(self):
+        mod_roles = await AsyncConnector.get_moderators(self.scope.instance_id)
 
-        action = CommunityAction(settings=True)
-        self.forbidden = not lib.permissions.check_user_permission(self.scope.instance_id, self.author.roles, required_perms=action)
+        self.role_drop = RoleDropDown(scope=self.scope, author=self.author, guild_roles=self.guild_roles, mod_roles=mod_roles)
+        self.add_item(self.role_drop)
 
-        if scope.is_private or (self.forbidden and not self.author.guild_permissions.administrator):
-            self.disable_all()
-            self.dd.disabled = False
+        # added first, the role dropdown is disabled for forbidden users as well
+        await super().init()
 
 
-    def update_ui_elements(self):
-        comm_mode = Connector.get_community_mode(self.scope.instance_id)
+    async def update_ui_elements(self):
+        comm_mode = await AsyncConnector.get_community_mode(self.scope.instance_id)
 
         if comm_mode == Connector.CommunityMode.ENABLED:
             self.mode_enabled.style=discord.ButtonStyle.success
@@ -357,7 +398,7 @@ class CommunitySettingsView(SettingsPageTemplate):
                                 color=Consts.col_err)
 
     async def send_update_ui(self, interaction: discord.Interaction):
-        self.update_ui_elements()
+        await self.update_ui_elements()
         await interaction.response.edit_message(view=self)
 
 
@@ -367,18 +408,19 @@ class CommunitySettingsView(SettingsPageTemplate):
 
     @discord.ui.button(label='Disabled', style=discord.ButtonStyle.secondary, row=0)
     async def mode_disablde(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_mode(self.scope.instance_id, Connector.CommunityMode.DISABLED)
+        await AsyncConnector.set_community_mode(self.scope.instance_id, Connector.CommunityMode.DISABLED)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Enabled', style=discord.ButtonStyle.secondary, row=0)
     async def mode_enabled(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_community_mode(self.scope.instance_id, Connector.CommunityMode.ENABLED)
+        await AsyncConnector.set_community_mode(self.scope.instance_id, Connector.CommunityMode.ENABLED)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Configure...', style=discord.ButtonStyle.secondary, row=0)
     async def mode_config(self, button: discord.ui.Button, interaction: discord.Interaction):
 
         view = CommunitySubSettings(self.scope, message=self.message)
+        await view.init()
         eb = view.get_embed()
         await interaction.response.edit_message(embed=eb, view=view)
 
@@ -386,7 +428,7 @@ class CommunitySettingsView(SettingsPageTemplate):
         self.message = view.message
 
         eb = self.get_embed()
-        self.update_ui_elements()
+        await self.update_ui_elements()
         await self.message.edit_original_message(embed=eb, view=self)
 
 
@@ -398,22 +440,14 @@ class CommunitySettingsView(SettingsPageTemplate):
 
 class BaseSettings(SettingsPageTemplate):
     def __init__(self, scope: Connector.Scope, author: Union[discord.User, discord.Member], guild_roles: list[discord.Role], page_callback, *args, **kwargs):
-        super().__init__(scope=scope, page=0, roles=[], page_callback=page_callback, dropdown_row=4, *args, **kwargs)
-        self.update_ui_elements()
-
-        action = CommunityAction(settings=True)
-        self.forbidden = not lib.permissions.check_user_permission(self.scope.instance_id, author.roles, required_perms=action)
-
-        if scope.is_private or (self.forbidden and not author.guild_permissions.administrator):
-            self.disable_all()
-            self.dd.disabled = False
+        super().__init__(scope=scope, author=author, page=0, roles=[], page_callback=page_callback, dropdown_row=4, *args, **kwargs)
 
 
-    def update_ui_elements(self):
-        self.server_tz_val.label = Connector.get_timezone(self.scope.instance_id)
-        rem_type = Connector.get_reminder_type(self.scope.instance_id)
-        del_type = Connector.get_auto_delete(self.scope.instance_id)
-        parse_legacy = Connector.is_legacy_interval(self.scope.instance_id)
+    async def update_ui_elements(self):
+        self.server_tz_val.label = await AsyncConnector.get_timezone(self.scope.instance_id)
+        rem_type = await AsyncConnector.get_reminder_type(self.scope.instance_id)
+        del_type = await AsyncConnector.get_auto_delete(self.scope.instance_id)
+        parse_legacy = await AsyncConnector.is_legacy_interval(self.scope.instance_id)
 
         
 
@@ -502,7 +536,7 @@ class BaseSettings(SettingsPageTemplate):
     
 
     async def send_update_ui(self, interaction: discord.Interaction):
-        self.update_ui_elements()
+        await self.update_ui_elements()
         await interaction.response.edit_message(view=self)
 
     
@@ -514,7 +548,7 @@ class BaseSettings(SettingsPageTemplate):
     @discord.ui.button(label='UTC', style=discord.ButtonStyle.secondary, row=0)
     async def server_tz_val(self, button: discord.ui.Button, interaction: discord.Interaction):
         # show timezone embed
-        eb = SettingsModule.get_tz_info_eb(Connector.get_timezone(self.scope.instance_id))
+        eb = SettingsModule.get_tz_info_eb(await AsyncConnector.get_timezone(self.scope.instance_id))
         await interaction.response.send_message(embed=eb, ephemeral=True)
 
 
@@ -523,22 +557,22 @@ class BaseSettings(SettingsPageTemplate):
         pass # do nothing when this one is pressed
     @discord.ui.button(label='Hybrid Reminders', style=discord.ButtonStyle.secondary, row=1)
     async def style_hybrid(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.HYBRID)
+        await AsyncConnector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.HYBRID)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Embed-Only Reminders', style=discord.ButtonStyle.secondary, row=1)
     async def style_embed(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.EMBED_ONLY)
+        await AsyncConnector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.EMBED_ONLY)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Text-Only Reminders', style=discord.ButtonStyle.secondary, row=1)
     async def style_text(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.TEXT_ONLY)
+        await AsyncConnector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.TEXT_ONLY)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Barebone Reminder', style=discord.ButtonStyle.secondary, row=1)
     async def style_bare(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.BAREBONE)
+        await AsyncConnector.set_reminder_type(self.scope.instance_id, Connector.ReminderType.BAREBONE)
         await self.send_update_ui(interaction)
 
 
@@ -548,17 +582,17 @@ class BaseSettings(SettingsPageTemplate):
 
     @discord.ui.button(label='Delete after Timeout', style=discord.ButtonStyle.secondary, row=2)
     async def del_timeout(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_auto_delete(self.scope.instance_id, Connector.AutoDelete.TIMEOUT)
+        await AsyncConnector.set_auto_delete(self.scope.instance_id, Connector.AutoDelete.TIMEOUT)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Never Delete', style=discord.ButtonStyle.secondary, row=2)
     async def del_never(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_auto_delete(self.scope.instance_id, Connector.AutoDelete.NEVER)
+        await AsyncConnector.set_auto_delete(self.scope.instance_id, Connector.AutoDelete.NEVER)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Only Show to author', style=discord.ButtonStyle.secondary, row=2)
     async def del_hidden(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_auto_delete(self.scope.instance_id, Connector.AutoDelete.HIDE)
+        await AsyncConnector.set_auto_delete(self.scope.instance_id, Connector.AutoDelete.HIDE)
         await self.send_update_ui(interaction)
 
 
@@ -568,12 +602,12 @@ class BaseSettings(SettingsPageTemplate):
 
     @discord.ui.button(label='Use local Timezone', style=discord.ButtonStyle.secondary, row=3)
     async def parse_local(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_legacy_interval(self.scope.instance_id, False)
+        await AsyncConnector.set_legacy_interval(self.scope.instance_id, False)
         await self.send_update_ui(interaction)
 
     @discord.ui.button(label='Legacy (always UTC)', style=discord.ButtonStyle.secondary, row=3)
     async def parse_legacy(self, button: discord.ui.Button, interaction: discord.Interaction):
-        Connector.set_legacy_interval(self.scope.instance_id, True)
+        await AsyncConnector.set_legacy_interval(self.scope.instance_id, True)
         await self.send_update_ui(interaction)
 
 
@@ -601,6 +635,7 @@ class SettingsManager():
 
 
     async def send(self):
+        await self.view.init()
         eb = self.view.get_embed()
         msg = await self.ctx.respond(embed=eb, view=self.view, ephemeral=True)
         self.view.message = msg
@@ -612,6 +647,7 @@ class SettingsManager():
             # get view based on next page
             new_page = int(self.view.dd.next_page)
             new_view = self._page_lookup(new_page)(scope=self.scope, author=self.ctx.author, guild_roles=self.roles, page_callback=self.page_switch, message=self.view.message)
+            await new_view.init()
 
             # stop the old view and replac with new one
             message = self.view.message
@@ -18,6 +18,7 @@ import lib.permissions
 import util.interaction
 from lib.CommunitySettings import CommunityAction
 from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
 from lib.Analytics import Analytics
 
 
@@ -181,7 +182,7 @@ class TimezoneModule(discord.Cog):
 
         await view.wait()
         if view.value:
-            Connector.set_timezone(instance_id, value)
+            await AsyncConnector.set_timezone(instance_id, value)
             Analytics.set_timezone(value, 
                                 country_code=self.timezone_country.get(value, 'UNK'),
                                 deprecated=value not in pytz_common_timezones)
@@ -215,7 +216,7 @@ class TimezoneModule(discord.Cog):
         instance_id = ctx.guild.id if ctx.guild else ctx.author.id
         roles = ctx.author.roles if isinstance(ctx.author, discord.member.Member) else []
 
-        if not lib.permissions.check_user_permission(instance_id, user_roles=roles, required_perms=CommunityAction(settings=True)):
+        if not await AsyncConnector.run(lib.permissions.check_user_permission, instance_id, user_roles=roles, required_perms=CommunityAction(settings=True)):
             return
 
         await self.set_timezone(ctx, instance_id, new_timezone)
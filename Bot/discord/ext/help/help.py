@@ -3,7 +3,7 @@ import logging
 from datetime import datetime, timedelta
 from dateutil import tz
 
-from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
 from lib.Analytics import Analytics
 
 log = logging.getLogger('ext.help')
@@ -469,8 +469,10 @@ class Help(discord.Cog):
     async def send_test_messages(self, ctx: discord.Interaction):
         
         instance_id = ctx.guild_id if ctx.guild_id else ctx.user.id
-        experimental = Connector.is_experimental(instance_id)
-        legacy = Connector.is_legacy_interval(instance_id)
+        # single cached lookup for all settings of the report
+        settings = await AsyncConnector.get_settings(instance_id)
+        experimental = settings.get('experimental', False)
+        legacy = settings.legacy_interval
         
         # create a report of the setup
         can_embed = False
@@ -504,7 +506,7 @@ class Help(discord.Cog):
             
         # other critical parameters are the correct timezone
         # aswell as the ability to DM the user
-        tz_str = Connector.get_timezone(instance_id)
+        tz_str = settings.timezone
         local_time = datetime.now(tz.gettz(tz_str)).strftime('%H:%M')
         
         dm = await ctx.user.create_dm()
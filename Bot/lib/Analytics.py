@@ -1,4 +1,6 @@
 import os
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from enum import Enum
 import logging
@@ -51,6 +53,7 @@ class Types:
         AUTHOR_FETCH = 2
         AUTHOR_DM = 3
         TARGET_IS_BOT = 4
+        RETRIES_EXHAUSTED = 5
 
 class Analytics:
 
@@ -151,6 +154,11 @@ class Analytics:
         ['shard']
     )
 
+    RULESET_CACHE_CNT = Counter(
+        'ruleset_cache_cnt', 'Lookups of the compiled rule caches',
+        ['cache', 'result']
+    )
+
     UNEXPECTED_EXCEPTION = Counter(
         'unexpected_exception_cnt', 'Hold all caught unhandled exceptions',
         ['shard', 'ex_type']
@@ -160,6 +168,85 @@ class Analytics:
         'undelivered_reminders', 'Reminders which couldn\'t be shown to the user',
         ['shard', 'type', 'scope', 'target', 'reason']
     )
+
+    DELIVERY_FAILED = Counter(
+        'reminder_delivery_failed', 'Reminder deliveries aborted by an exception',
+        ['shard', 'type', 'ex_type']
+    )
+
+    DELIVERY_STAGE = Histogram(
+        'delivery_stage_seconds', 'Duration of a single delivery stage (claim, resolve, render, send)',
+        ['stage', 'type', 'route'],
+        buckets=(
+            0.005,
+            0.01,
+            0.025,
+            0.05,
+            0.1,
+            0.25,
+            0.5,
+            1,
+            2.5,
+            5,
+            10,
+            30,
+            float('inf')
+        )
+    )
+
+    REMINDER_DUE_DELIVERED = Histogram(
+        'reminder_due_delivered_seconds', 'Seconds between the due date and the delivery of a reminder',
+        ['type', 'route'],
+        buckets=(
+            1,
+            2,
+            5,
+            10,
+            30,
+            60,
+            2*60,
+            5*60,
+            10*60,
+            30*60,
+            60*60,
+            float('inf')
+        )
+    )
+
+    DELIVERY_QUEUE_DEPTH = Gauge(
+        'delivery_queue_depth', 'Reminders waiting for a rate limit token',
+        ['route']
+    )
+
+    RESOLVER_CNT = Counter(
+        'resolver_lookup_cnt', 'Lookups of discord objects by their source',
+        ['kind', 'source']
+    )
+
+    REMINDER_BACKLOG = Gauge(
+        'reminder_backlog', 'Elapsed reminders waiting for their delivery during a catch-up'
+    )
+
+    BACKLOG_DRAIN_ESTIMATE = Gauge(
+        'reminder_backlog_drain_seconds', 'Estimated seconds until the backlog is delivered'
+    )
+
+    DELIVERY_WAIT = Histogram(
+        'delivery_wait', 'Seconds a reminder waited for a rate limit token',
+        ['route'],
+        buckets=(
+            0.01,
+            0.1,
+            0.5,
+            1,
+            2,
+            5,
+            10,
+            30,
+            60,
+            float('inf')
+        )
+    )
     
     TIMEZONE_SET = Counter(
         'timezone_set', 'Timezone set by a server',
@@ -301,6 +388,14 @@ class Analytics:
     def ruleset_removed(shard:int =0):
         Analytics.RULESET_REMOVED_CNT.labels(str(shard)).inc()
 
+    @staticmethod
+    def ruleset_cache_access(cache_name: str, hit: bool):
+        Analytics.RULESET_CACHE_CNT.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+    @staticmethod
+    def resolver_lookup(kind: str, source: str):
+        Analytics.RESOLVER_CNT.labels(kind, source).inc()
+
     @staticmethod
     def register_exception(exception, shard:int = 0):
         ex_type = type(exception).__name__
@@ -327,6 +422,70 @@ class Analytics:
 
         Analytics.UNDELIVERED_REMINDER.labels(str(shard), r_type.name, r_scope.name, r_tgt.name, reason.name).inc()
         
+    @staticmethod
+    def reminder_delivery_failed(reminder, exception, shard:int = 0):
+
+        if isinstance(reminder, IntervalReminder):
+            r_type = Types.ReminderType.REPEATING
+        else:
+            r_type = Types.ReminderType.ONE_SHOT
+
+        Analytics.DELIVERY_FAILED.labels(str(shard), r_type.name, type(exception).__name__).inc()
+
+    @staticmethod
+    def _get_reminder_type(reminder) -> Types.ReminderType:
+        # accepts reminder objects aswell as the classes
+        r_cls = reminder if isinstance(reminder, type) else type(reminder)
+
+        if issubclass(r_cls, IntervalReminder):
+            return Types.ReminderType.REPEATING
+        else:
+            return Types.ReminderType.ONE_SHOT
+
+    @staticmethod
+    @contextmanager
+    def delivery_stage(stage: str, reminder, route: str):
+        """measure the duration of a delivery stage
+
+        Args:
+            stage (str): claim, resolve, render or send
+            reminder (Reminder): reminder (or reminder class) which is delivered
+            route (str): channel, dm or any
+        """
+        r_type = Analytics._get_reminder_type(reminder)
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            Analytics.DELIVERY_STAGE.labels(stage, r_type.name, route).observe(time.perf_counter() - start)
+
+    @staticmethod
+    def reminder_delivered(reminder, route: str, due_at: datetime):
+        """observe the end-to-end delay of every delivered reminder
+
+        Args:
+            route (str): channel or dm
+            due_at (datetime): utc due date of the delivered occurrence
+        """
+        r_type = Analytics._get_reminder_type(reminder)
+        delay = max(0.0, (datetime.utcnow() - due_at).total_seconds()) if due_at else 0.0
+
+        Analytics.REMINDER_DUE_DELIVERED.labels(r_type.name, route).observe(delay)
+
+    @staticmethod
+    def delivery_queued(route: str, delta: int):
+        Analytics.DELIVERY_QUEUE_DEPTH.labels(route).inc(delta)
+
+    @staticmethod
+    def delivery_wait(route: str, seconds: float):
+        Analytics.DELIVERY_WAIT.labels(route).observe(seconds)
+
+    @staticmethod
+    def reminder_backlog(backlog: int, drain_secs: float):
+        Analytics.REMINDER_BACKLOG.set(backlog)
+        Analytics.BACKLOG_DRAIN_ESTIMATE.set(drain_secs)
+
     @staticmethod
     def reminder_delay(reminder, now=None, shard:int=0, allowed_delay=0):
 
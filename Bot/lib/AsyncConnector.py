@@ -0,0 +1,79 @@
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from lib.Connector import Connector
+
+
+import logging
+
+
+
+log = logging.getLogger('Remindme.Connector')
+
+
+
+class _AsyncConnectorMeta(type):
+
+    def __getattr__(cls, name):
+        # expose every public Connector method as a coroutine function
+        # nested types (Scope, ReminderType, ...) are passed through unchanged
+        attr = getattr(Connector, name)
+
+        if name.startswith('_') or isinstance(attr, type) or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await cls.run(attr, *args, **kwargs)
+
+        return wrapper
+
+
+
+class AsyncConnector(metaclass=_AsyncConnectorMeta):
+    """non-blocking facade of the Connector
+       every Connector method can be awaited from the event loop, e.g.
+
+           tz_str = await AsyncConnector.get_timezone(instance_id)
+
+       the pymongo calls are executed on a dedicated thread pool,
+       the synchronous Connector stays available for non-async code
+    """
+
+    executor = None
+
+
+    @staticmethod
+    def init():
+        workers = int(os.getenv('MONGO_WORKERS', '8'))
+        AsyncConnector.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mongo')
+        log.info(f'async connector started with {workers} worker(s)')
+
+
+    @staticmethod
+    async def run(func, *args, **kwargs):
+        """execute any blocking callable on the database thread pool
+           used for Connector methods as well as helpers which query
+           the database implicitly (e.g. IntervalReminder.next_trigger)
+
+        Args:
+            func (callable): blocking function
+
+        Returns:
+            any: return value of func
+        """
+
+        if AsyncConnector.executor is None:
+            AsyncConnector.init()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(AsyncConnector.executor, functools.partial(func, *args, **kwargs))
+
+
+    @staticmethod
+    def shutdown():
+        if AsyncConnector.executor:
+            AsyncConnector.executor.shutdown(wait=True)
+            AsyncConnector.executor = None
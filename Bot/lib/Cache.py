@@ -0,0 +1,78 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+
+class LRUCache:
+    """thread-safe LRU cache with optional TTL
+       the Connector is used from the event loop and the db thread pool,
+       therefore all operations are guarded by a lock
+    """
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int = 1024, ttl: float = None):
+        """
+        Args:
+            maxsize (int, optional): max number of entries, least recently used are evicted first. Defaults to 1024.
+            ttl (float, optional): lifetime of an entry in seconds, None for no expiry. Defaults to None.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def __contains__(self, key):
+        return self.get(key, LRUCache._MISSING) is not LRUCache._MISSING
+
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, LRUCache._MISSING)
+
+            if entry is LRUCache._MISSING:
+                return default
+
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+
+    def set(self, key, value, ttl: float = None):
+        """add or replace an entry
+
+        Args:
+            ttl (float, optional): override the default ttl of the cache. Defaults to None.
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        expires = (time.monotonic() + ttl) if ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, LRUCache._MISSING)
+
+        return default if entry is LRUCache._MISSING else entry[0]
+
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
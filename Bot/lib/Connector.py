@@ -1,5 +1,7 @@
 import os
-from datetime import datetime
+import uuid
+import socket
+from datetime import datetime, timedelta
 from enum import Enum
 from typing import Union
 
@@ -8,6 +10,7 @@ from pymongo import MongoClient
 
 from lib.Reminder import Reminder, IntervalReminder
 from lib.CommunitySettings import CommunitySettings
+from lib.Cache import LRUCache
 
 
 import logging
@@ -22,6 +25,25 @@ class Connector:
 
     client = None
     db = None
+    # identifies this process when claiming reminders
+    worker_id = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    # cluster mode, only reminders of these shards are delivered by this process
+    # all shards are served if shard_ids is None
+    shard_count = None
+    shard_ids = None
+    # lib.Scheduler.Scheduler notified about new trigger times, optional
+    scheduler = None
+    # settings snapshots by instance id, see get_settings
+    settings_cache = LRUCache(maxsize=int(os.getenv('SETTINGS_CACHE_SIZE', '10000')),
+                              ttl=float(os.getenv('SETTINGS_CACHE_TTL', '300')))
+    # incremented on every invalidation
+    # prevents caching a snapshot which was read before a concurrent change
+    settings_generation = 0
+    # number of changed instance ids kept in the settings changelog
+    SETTINGS_LOG_SIZE = 256
+    # delivered channel reminders are archived for the snooze buttons of their message
+    DELIVERED_RETENTION_SECS = int(os.getenv('DELIVERED_RETENTION_SECS', '172800'))
+
     class Scope():
         def __init__(self, is_private=False, guild_id=None, user_id=None):
             self.is_private = is_private
@@ -43,8 +65,63 @@ class Connector:
     class CommunityMode(Enum):
         DISABLED = 1
         ENABLED = 2
-        
-    
+
+    class SettingsSnapshot():
+        """read-only copy of the settings document of a single instance
+           a missing document is cached aswell, all getters return their defaults
+        """
+        def __init__(self, instance_id, settings_json=None):
+            self.instance_id = instance_id
+            self.exists = settings_json is not None
+            self._json = settings_json or {}
+
+        def get(self, key, default=None):
+            return self._json.get(key, default)
+
+        @property
+        def timezone(self) -> str:
+            return self._json.get('timezone', 'UTC')
+
+        @property
+        def legacy_interval(self) -> bool:
+            # if no entry exists, legacy is assumed for backwards compatibility
+            return self._json.get('legacy_interval', True)
+
+
+    # all indexes required by the hot queries
+    # (collection, keys, options), the name must be unique per collection
+    INDEXES = [
+        # claim_elapsed_reminders, get_pending_intervals, get_upcoming_at
+        # 'at' is the prefix, unfiltered queries use the index as well
+        # the $mod on shard_key is evaluated on the index keys
+        ('reminders', [('at', pymongo.ASCENDING), ('shard_key', pymongo.ASCENDING)], {'name': 'at_shard_key'}),
+        ('intervals', [('at', pymongo.ASCENDING), ('shard_key', pymongo.ASCENDING)], {'name': 'at_shard_key'}),
+        # _get_user_reminders, _get_user_private_reminders
+        ('reminders', [('g_id', pymongo.ASCENDING), ('author', pymongo.ASCENDING)], {'name': 'g_id_author'}),
+        ('intervals', [('g_id', pymongo.ASCENDING), ('author', pymongo.ASCENDING)], {'name': 'g_id_author'}),
+        # delete_orphaned_intervals
+        # descending key, mongo <5.0 rejects a second index on the same key pattern
+        ('intervals', [('at', pymongo.DESCENDING)], {'name': 'at_orphaned', 'partialFilterExpression': {'at': {'$type': 'null'}}}),
+        # mark_channel_dead
+        ('reminders', [('ch_id', pymongo.ASCENDING)], {'name': 'ch_id'}),
+        ('intervals', [('ch_id', pymongo.ASCENDING)], {'name': 'ch_id'}),
+        # every settings getter/setter
+        ('settings', [('g_id', pymongo.ASCENDING)], {'name': 'g_id'}),
+        # is_moderator
+        ('settings', [('moderators', pymongo.ASCENDING)], {'name': 'moderators'}),
+        # acquire_lock, expired locks are removed by mongo
+        ('locks', [('expires_at', pymongo.ASCENDING)], {'name': 'expires_at', 'expireAfterSeconds': 0}),
+        # ack_reminder, the archive of delivered reminders is removed by mongo
+        ('delivered', [('expires_at', pymongo.ASCENDING)], {'name': 'expires_at', 'expireAfterSeconds': 0}),
+    ]
+
+    # indexes of previous versions, dropped on start
+    # 'at' is a redundant prefix of 'at_shard_key'
+    OBSOLETE_INDEXES = [
+        ('reminders', 'at'),
+        ('intervals', 'at'),
+    ]
+
 
     @staticmethod
     def init():
@@ -57,10 +134,275 @@ class Connector:
         Connector.client = MongoClient(host=host, username=uname, password=pw, port=port)
         Connector.db = Connector.client.reminderBot
 
+        Connector.ensure_indexes()
+        Connector.backfill_shard_keys()
+
+        missing = Connector.get_missing_indexes()
+        if missing:
+            missing_str = ', '.join(missing)
+            log.critical(f'database is missing required indexes: {missing_str}')
+
+            if os.getenv('MONGO_REQUIRE_INDEXES', '').lower() in ('1', 'true', 'yes'):
+                raise RuntimeError(f'database is missing required indexes: {missing_str}')
+
+
+    @staticmethod
+    def set_shards(shard_count: int, shard_ids: list):
+        """restrict the delivery queries to the given shards
+
+        Args:
+            shard_count (int): total number of shards of the bot
+            shard_ids (list): shards served by this process, None for all shards
+        """
+        Connector.shard_count = shard_count
+        Connector.shard_ids = shard_ids
+
+
+    @staticmethod
+    def _shard_filter():
+        if not Connector.shard_ids:
+            return {}
+
+        return {'$or': [{'shard_key': {'$mod': [Connector.shard_count, shard_id]}} for shard_id in Connector.shard_ids]}
+
+
+    @staticmethod
+    def backfill_shard_keys(batch_size: int = 1000):
+        """add the shard_key to documents created before cluster mode
+           runs once, completion is recorded in the meta collection
+           documents of newer versions always have a shard_key
+
+        Returns:
+            int: number of updated documents
+        """
+
+        # skip the scan of both collections on every start
+        if Connector.db.meta.find_one({'_id': 'migrations', 'shard_keys': True}):
+            return 0
+
+        updated = 0
+        for coll, model in ((Connector.db.reminders, Reminder), (Connector.db.intervals, IntervalReminder)):
+            ops = []
+            for doc in coll.find({'shard_key': {'$exists': False}}, {'g_id': 1, 'author': 1}):
+                ops.append(pymongo.UpdateOne({'_id': doc['_id']}, {'$set': {'shard_key': model(doc).get_shard_key()}}))
+
+                if len(ops) >= batch_size:
+                    updated += coll.bulk_write(ops, ordered=False).modified_count
+                    ops = []
+
+            if ops:
+                updated += coll.bulk_write(ops, ordered=False).modified_count
+
+        if updated:
+            log.info(f'added shard keys to {updated} reminder(s)')
+
+        Connector.db.meta.update_one({'_id': 'migrations'}, {'$set': {'shard_keys': True}}, upsert=True)
+
+        return updated
+
+
+    @staticmethod
+    def ensure_indexes():
+        """create all indexes of the manifest and drop the obsolete ones
+           existing indexes are not modified,
+           failures are logged and reported by get_missing_indexes
+        """
+
+        for coll_name, keys, options in Connector.INDEXES:
+            try:
+                Connector.db[coll_name].create_index(keys, **options)
+            except pymongo.errors.OperationFailure as e:
+                log.error(f'failed to create index {coll_name}.{options["name"]}: {e}')
+
+        for coll_name, name in Connector.OBSOLETE_INDEXES:
+            try:
+                if name in Connector.db[coll_name].index_information():
+                    Connector.db[coll_name].drop_index(name)
+                    log.info(f'dropped obsolete index {coll_name}.{name}')
+            except pymongo.errors.OperationFailure as e:
+                log.error(f'failed to drop index {coll_name}.{name}: {e}')
+
+
+    @staticmethod
+    def get_missing_indexes() -> list:
+        """compare the index manifest with the indexes present in the db
+
+        Returns:
+            list: names of missing indexes, formatted as <collection>.<name>
+        """
+
+        missing = []
+        present = {}
+
+        for coll_name, _, options in Connector.INDEXES:
+            if coll_name not in present:
+                present[coll_name] = Connector.db[coll_name].index_information()
+
+            if options['name'] not in present[coll_name]:
+                missing.append(f'{coll_name}.{options["name"]}')
+
+        return missing
+
+
+    @staticmethod
+    def acquire_lock(name: str, owner: str, ttl_secs: int) -> bool:
+        """acquire or renew a named lock
+           the lock is granted if it's free, expired or already held by the owner
+
+        Args:
+            name (str): name of the lock
+            owner (str): unique id of the requesting process
+            ttl_secs (int): the lock expires if not renewed within this time
+
+        Returns:
+            bool: True if the owner holds the lock
+        """
+
+        now = datetime.utcnow()
+
+        try:
+            # a held lock doesn't match, the upsert then fails on the duplicate _id
+            Connector.db.locks.find_one_and_update({'_id': name, '$or': [{'owner': owner}, {'expires_at': {'$lt': now}}]},
+                                                   {'$set': {'owner': owner, 'expires_at': now + timedelta(seconds=ttl_secs)}},
+                                                   upsert=True)
+        except pymongo.errors.DuplicateKeyError:
+            return False
+
+        return True
+
+
+    @staticmethod
+    def release_lock(name: str, owner: str) -> bool:
+        """release a lock held by the owner
+
+        Returns:
+            bool: True if the lock was released
+        """
+        action = Connector.db.locks.delete_one({'_id': name, 'owner': owner})
+        return (action.deleted_count > 0)
+
+
+    @staticmethod
+    def get_settings(instance_id: int) -> SettingsSnapshot:
+        """get the settings of an instance with a single query
+           the snapshot is cached until it expires or the settings are changed
+
+        Args:
+            instance_id (int): guild id or user id for DMs
+
+        Returns:
+            SettingsSnapshot: settings of the instance, never None
+        """
+
+        # keep g_id as key for backwards compatibility
+        key = str(instance_id)
+
+        snapshot = Connector.settings_cache.get(key)
+        if snapshot is None:
+            generation = Connector.settings_generation
+            settings_json = Connector.db.settings.find_one({'g_id': key})
+            snapshot = Connector.SettingsSnapshot(instance_id, settings_json)
+
+            if generation == Connector.settings_generation:
+                Connector.settings_cache.set(key, snapshot)
+
+        return snapshot
+
+
+    @staticmethod
+    def get_settings_many(instance_ids) -> dict:
+        """get the settings of many instances
+           cached snapshots are reused, the remaining ones are fetched with a single query
+
+        Args:
+            instance_ids (iterable): guild or user ids
+
+        Returns:
+            dict: SettingsSnapshot by instance id
+        """
+
+        snapshots = {}
+        missing = []
+
+        for instance_id in set(instance_ids):
+            snapshot = Connector.settings_cache.get(str(instance_id))
+            if snapshot is None:
+                missing.append(instance_id)
+            else:
+                snapshots[instance_id] = snapshot
+
+        if not missing:
+            return snapshots
+
+        generation = Connector.settings_generation
+        settings_json = {s['g_id']: s for s in Connector.db.settings.find({'g_id': {'$in': list(map(str, missing))}})}
+
+        for instance_id in missing:
+            snapshot = Connector.SettingsSnapshot(instance_id, settings_json.get(str(instance_id), None))
+            snapshots[instance_id] = snapshot
+
+            if generation == Connector.settings_generation:
+                Connector.settings_cache.set(str(instance_id), snapshot)
+
+        return snapshots
+
+
+    @staticmethod
+    def invalidate_settings(instance_id: int=None):
+        """drop the cached settings of an instance
+
+        Args:
+            instance_id (int, optional): guild or user id, drops all snapshots if None. Defaults to None.
+        """
+
+        Connector.settings_generation += 1
+
+        if instance_id is None:
+            Connector.settings_cache.clear()
+        else:
+            Connector.settings_cache.pop(str(instance_id))
+
+
+    @staticmethod
+    def _update_settings(instance_id: int, update: dict):
+        # every settings write must go through here
+        # otherwise the cached snapshot stays stale until it expires
+        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, update, new=False, upsert=True)
+        Connector.invalidate_settings(instance_id)
+        Connector._log_settings_change(instance_id)
+
+
+    @staticmethod
+    def _log_settings_change(instance_id: int):
+        # the changelog is polled by processes without change stream support
+        # version and entry are updated atomically, the last entry always belongs to the current version
+        Connector.db.meta.update_one({'_id': 'settings'},
+                                     {'$inc': {'version': 1},
+                                      '$push': {'recent': {'$each': [str(instance_id)], '$slice': -Connector.SETTINGS_LOG_SIZE}}},
+                                     upsert=True)
+
+
+    @staticmethod
+    def get_settings_changelog():
+        """get the settings changelog, used to invalidate cached settings by polling
+
+        Returns:
+            tuple(int, list): current version, ids of the last changed instances (oldest first)
+        """
+
+        meta = Connector.db.meta.find_one({'_id': 'settings'})
+
+        if not meta:
+            return (0, [])
+        else:
+            return (meta.get('version', 0), meta.get('recent', []))
+
 
     @staticmethod
     def delete_guild(guild_id: int):
         Connector.db.settings.delete_one({'g_id': str(guild_id)})
+        Connector.invalidate_settings(guild_id)
+        Connector._log_settings_change(guild_id)
         rem_cursor = Connector.db.reminders.delete_many({'g_id': str(guild_id)})
         intvl_cursor = Connector.db.intervals.delete_many({'g_id': str(guild_id)})
         
@@ -73,12 +415,7 @@ class Connector:
         # the settings key is 'g_id'
         # however guilds aswell as user ids are supported as key
         # for backwards compatibility with the database, the key name wasn't changed to instance_id
-        tz_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'timezone': 1})
-
-        if not tz_json:
-            return 'UTC'
-        else:
-            return tz_json.get('timezone', 'UTC')
+        return Connector.get_settings(instance_id).timezone
 
 
     @staticmethod
@@ -87,54 +424,42 @@ class Connector:
         # the settings key is 'g_id'
         # however guilds aswell as user ids are supported as key
         # for backwards compatibility with the database, the key name wasn't changed to instance_id
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {'timezone': timezone_str}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {'timezone': timezone_str}})
         
         
     @staticmethod
     def  get_reminder_type(instance_id: int) -> ReminderType:
         
         # keep g_id as key for backwards compatibility
-        rem_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'reminder_type': 1})
-        
-        if not rem_json:
-            return Connector.ReminderType.HYBRID
-        else:
-            return Connector.ReminderType[rem_json.get('reminder_type', Connector.ReminderType.HYBRID.name)]
+        rem_type = Connector.get_settings(instance_id).get('reminder_type', Connector.ReminderType.HYBRID.name)
+        return Connector.ReminderType[rem_type]
     
         
     @staticmethod
     def set_auto_delete(instance_id: int, delete_type: AutoDelete):
         
         # keep g_id as key for backwards compatibility
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {'auto_delete': delete_type.name}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {'auto_delete': delete_type.name}})
         
     @staticmethod
     def  get_auto_delete(instance_id: int):
         
         # keep g_id as key for backwards compatibility
-        rem_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'auto_delete': 1})
-        
-        if not rem_json:
-            return Connector.AutoDelete.TIMEOUT
-        else:
-            return Connector.AutoDelete[rem_json.get('auto_delete', Connector.AutoDelete.TIMEOUT.name)]
+        delete_type = Connector.get_settings(instance_id).get('auto_delete', Connector.AutoDelete.TIMEOUT.name)
+        return Connector.AutoDelete[delete_type]
         
     @staticmethod
     def set_community_mode(instance_id: int, comm_type: CommunityMode):
         
         # keep g_id as key for backwards compatibility
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {'community': comm_type.name}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {'community': comm_type.name}})
         
     @staticmethod
     def get_community_mode(instance_id: int):
         
         # keep g_id as key for backwards compatibility
-        rem_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'community': 1})
-        
-        if not rem_json:
-            return Connector.CommunityMode.DISABLED
-        else:
-            return Connector.CommunityMode[rem_json.get('community', Connector.CommunityMode.DISABLED.name)]
+        comm_type = Connector.get_settings(instance_id).get('community', Connector.CommunityMode.DISABLED.name)
+        return Connector.CommunityMode[comm_type]
 
 
     @staticmethod
@@ -144,7 +469,7 @@ class Connector:
 
     @staticmethod
     def set_legacy_interval(instance_id: int, mode: bool):
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {'legacy_interval': mode}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {'legacy_interval': mode}})
 
 
     @staticmethod
@@ -152,12 +477,7 @@ class Connector:
         """check if the instance uses legacy intervals
            if no entry exists, legacy is assumed for backwards compatibility
         """
-        exp_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'legacy_interval': 1})
-        
-        if not exp_json:
-            return True
-        else:
-            return exp_json.get('legacy_interval', True)
+        return Connector.get_settings(instance_id).legacy_interval
 
 
     @staticmethod
@@ -167,17 +487,25 @@ class Connector:
 
     @staticmethod
     def set_experimental(instance_id: int, mode: bool):
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {'experimental': mode}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {'experimental': mode}})
     
     @staticmethod
     def is_experimental(instance_id: int):
         
-        exp_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'experimental': 1})
-        
-        if not exp_json:
-            return False
-        else:
-            return exp_json.get('experimental', False)
+        return Connector.get_settings(instance_id).get('experimental', False)
+
+
+    @staticmethod
+    def set_coalesce(instance_id: int, mode: bool):
+        Connector._update_settings(instance_id, {'$set': {'coalesce': mode}})
+
+
+    @staticmethod
+    def is_coalesce(instance_id: int) -> bool:
+        """check if reminders due at the same time for the same channel
+           are merged into a single message, disabled by default
+        """
+        return Connector.get_settings(instance_id).get('coalesce', False)
 
 
     @staticmethod
@@ -189,7 +517,7 @@ class Connector:
     def set_community_settings(instance_id: int, settings: CommunitySettings) -> CommunitySettings:
         
         settings_json = settings._to_json()
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {'community_settings': settings_json}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {'community_settings': settings_json}})
     
     
     @staticmethod
@@ -199,18 +527,13 @@ class Connector:
         if not hasattr(dummy_settings, setting_name):
             raise ValueError(f'{setting_name} is not an attribute of CommunitySettings')
         
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {f'community_settings.{setting_name}': value}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {f'community_settings.{setting_name}': value}})
     
     @staticmethod
     def get_community_settings(instance_id: int) -> CommunitySettings:
         
         # keep g_id as key for backwards compatibility
-        comm_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'community_settings': 1})
-        
-        if not comm_json:
-            return CommunitySettings()
-        else:
-            return CommunitySettings(comm_json.get('community_settings', {}))
+        return CommunitySettings(Connector.get_settings(instance_id).get('community_settings', {}))
 
 
     @staticmethod
@@ -223,28 +546,23 @@ class Connector:
         """
         
         # keep g_id as key for backwards compatibility
-        Connector.db.settings.find_one_and_update({'g_id': str(guild_id)}, {'$set': {'moderators': list(map(str, moderators))}}, new=False, upsert=True)
+        Connector._update_settings(guild_id, {'$set': {'moderators': list(map(str, moderators))}})
 
 
     @staticmethod
     def get_moderators(instance_id: int):
         
         # keep g_id as key for backwards compatibility
-        mod_json = Connector.db.settings.find_one({'g_id': str(instance_id)}, {'moderators': 1})
-        
-        if not mod_json:
-            return []
-        else:
-            return list(map(int, mod_json.get('moderators', [])))
+        return list(map(int, Connector.get_settings(instance_id).get('moderators', [])))
     
     @staticmethod
-    def is_moderator(user_roles: list):
+    def is_moderator(user_roles: list, guild_id: int=None):
         """check if any of the user roles are within the noted moderator lists
            query is implicitely protected from cross-guild access
 
         Args:
             user_roles (list): list of role ids
-            guild_id (int): id of the guild, DMs not supported (will always return False)
+            guild_id (int, optional): id of the guild, uses the cached settings if given. Defaults to None.
             
         Return:
             bool: True if any of the user roles is a moderator role
@@ -272,6 +590,10 @@ class Connector:
         else:
             raise TypeError('user_roles must hold entities of type str, int or entities must have .id attribute')
         
+        if guild_id is not None:
+            moderators = Connector.get_settings(guild_id).get('moderators', [])
+            return not set(user_roles).isdisjoint(moderators)
+
         result = Connector.db.settings.find_one({'moderators': {'$in': user_roles}})
         return result != None
 
@@ -280,7 +602,7 @@ class Connector:
     def set_reminder_type(instance_id: int, reminder_type: ReminderType):
         
         # keep g_id as key for backwards compatibility
-        Connector.db.settings.find_one_and_update({'g_id': str(instance_id)}, {'$set': {'reminder_type': reminder_type.name}}, new=False, upsert=True)
+        Connector._update_settings(instance_id, {'$set': {'reminder_type': reminder_type.name}})
 
 
     @staticmethod
@@ -293,13 +615,17 @@ class Connector:
         Returns:
             ObjectId: id of the database entry
         """
-        insert_obj = Connector.db.reminders.insert_one(reminder._to_json())
+        rem_json = reminder._to_json()
+        insert_obj = Connector.db.reminders.insert_one(rem_json)
+        Connector._notify_scheduler(rem_json['at'])
         return insert_obj.inserted_id
 
     @staticmethod
     def add_interval(interval: IntervalReminder):
         
-        insert_obj = Connector.db.intervals.insert_one(interval._to_json())
+        intvl_json = interval._to_json()
+        insert_obj = Connector.db.intervals.insert_one(intvl_json)
+        Connector._notify_scheduler(intvl_json['at'])
         return insert_obj.inserted_id
 
 
@@ -317,24 +643,160 @@ class Connector:
 
         at_ts = reminder._to_json()['at']
         Connector.db.reminders.find_one_and_update({'_id': reminder._id}, {'$set': {'at': at_ts}}, new=False, upsert=False)
+        Connector._notify_scheduler(at_ts)
 
 
     @staticmethod
     def update_interval_at(interval: IntervalReminder):
         
+        intvl_js = interval._to_json()
+
         if not interval.at:
             log.warning(f'Orphaned interval reminder {interval._id}.')
             at_ts = None
         else:
-            at_ts = interval._to_json()['at']
+            at_ts = intvl_js['at']
 
-        Connector.db.intervals.find_one_and_update({'_id': interval._id}, {'$set': {'at': at_ts}}, new=False, upsert=False)
+        # the precomputed occurrences are consumed by next_trigger
+        Connector.db.intervals.find_one_and_update({'_id': interval._id}, {'$set': {'at': at_ts, 'upcoming': intvl_js['upcoming']}}, new=False, upsert=False)
+        Connector._notify_scheduler(at_ts)
+
+
+    @staticmethod
+    def bulk_update_interval_at(intervals: list) -> dict:
+        """update the trigger time of many intervals with a single unordered bulk write
+           a failed update doesn't abort the remaining updates
+
+        Args:
+            intervals (list[IntervalReminder]): intervals with their new at
+
+        Returns:
+            dict: error message by interval id for each failed update, empty if all succeeded
+        """
+
+        ops = []
+        at_tss = []
+        for interval in intervals:
+            intvl_js = interval._to_json()
+
+            if not interval.at:
+                log.warning(f'Orphaned interval reminder {interval._id}.')
+                at_ts = None
+            else:
+                at_ts = intvl_js['at']
+
+            ops.append(pymongo.UpdateOne({'_id': interval._id}, {'$set': {'at': at_ts, 'upcoming': intvl_js['upcoming']}}))
+            at_tss.append(at_ts)
+
+        if not ops:
+            return {}
+
+        failed = {}
+        try:
+            Connector.db.intervals.bulk_write(ops, ordered=False)
+        except pymongo.errors.BulkWriteError as e:
+            for wc_err in e.details.get('writeConcernErrors', []):
+                log.error(f'interval update write concern error: {wc_err.get("errmsg")}')
+
+            failed = {intervals[err['index']]._id: err.get('errmsg', 'unknown error') for err in e.details.get('writeErrors', [])}
+
+        for interval, at_ts in zip(intervals, at_tss):
+            if interval._id not in failed:
+                Connector._notify_scheduler(at_ts)
+
+        return failed
+
+
+    @staticmethod
+    def bulk_update_interval_upcoming(intervals: list) -> int:
+        """store the refilled occurrences of many intervals
+           intervals which were triggered or edited in the meantime are skipped
+
+        Args:
+            intervals (list[IntervalReminder]): intervals with refilled occurrences
+
+        Returns:
+            int: number of updated intervals
+        """
+
+        ops = []
+        for interval in intervals:
+            intvl_js = interval._to_json()
+            ops.append(pymongo.UpdateOne({'_id': interval._id, 'at': intvl_js['at']}, {'$set': {'upcoming': intvl_js['upcoming']}}))
+
+        if not ops:
+            return 0
+
+        return Connector.db.intervals.bulk_write(ops, ordered=False).modified_count
+
+
+    @staticmethod
+    def _notify_scheduler(at_ts):
+        if Connector.scheduler:
+            Connector.scheduler.schedule(at_ts)
+
+
+    @staticmethod
+    def get_upcoming_at(timestamp) -> list:
+        """get the trigger times of all reminders and intervals up to the timestamp,
+           elapsed but undelivered ones are included
+           leased reminders (claimed or waiting for a retry) trigger once their lease expires
+
+        Args:
+            timestamp (float): end of the window
+
+        Returns:
+            list: distinct utc timestamps
+        """
+
+        now_ts = datetime.utcnow().timestamp()
+        query = {'at': {'$lte': timestamp}, **Connector._shard_filter()}
+
+        at_tss = set()
+        for doc in Connector.db.reminders.find(query, {'_id': 0, 'at': 1, 'lease_until': 1}):
+            lease_until = doc.get('lease_until')
+            if not lease_until or lease_until < now_ts:
+                at_tss.add(doc['at'])
+            elif lease_until <= timestamp:
+                # an elapsed 'at' would trigger passes which can't claim the reminder
+                at_tss.add(lease_until)
+
+        # covered by the 'at_shard_key' index
+        at_tss.update(doc['at'] for doc in Connector.db.intervals.find(query, {'_id': 0, 'at': 1}))
+
+        return list(at_tss)
+
+
+    @staticmethod
+    def get_next_due_at(after_ts: float) -> float:
+        """get the earliest trigger time of all reminders and intervals after the timestamp
+           both queries are covered by the 'at_shard_key' index and read a single key
+
+        Args:
+            after_ts (float): exclusive lower bound
+
+        Returns:
+            float: utc timestamp, None if nothing is due after the timestamp
+        """
+
+        query = {'at': {'$gt': after_ts}, **Connector._shard_filter()}
+        projection = {'_id': 0, 'at': 1}
+
+        next_tss = []
+        for coll in (Connector.db.reminders, Connector.db.intervals):
+            doc = coll.find_one(query, projection, sort=[('at', pymongo.ASCENDING)])
+            if doc:
+                next_tss.append(doc['at'])
+
+        return min(next_tss, default=None)
 
 
     @staticmethod
     def delete_orphaned_intervals():
 
-        op = Connector.db.intervals.delete_many({'at': {'$eq': None}})
+        # '$type' instead of '$eq' allows to use the partial 'at_orphaned' index
+        # update_interval_at always sets 'at', therefore no orphan is missing the field
+        op = Connector.db.intervals.delete_many({'at': {'$type': 'null'}})
         return op.deleted_count
 
 
@@ -352,23 +814,306 @@ class Connector:
     @staticmethod
     def pop_elapsed_reminders(timestamp):
 
-        rems =  list(Connector.db.reminders.find({'at': {'$lt': timestamp}}))
+        query = {'at': {'$lt': timestamp}, **Connector._shard_filter()}
+        rems =  list(Connector.db.reminders.find(query))
         rems = list(map(Reminder, rems))
 
         # this method pops the entries
-        Connector.db.reminders.delete_many({'at': {'$lt': timestamp}})
+        Connector.db.reminders.delete_many(query)
+
+        return rems
+
+
+    @staticmethod
+    def _lease_free_filter(now_ts):
+        """match all reminders which are not claimed by any worker
+           or whose lease has already expired
+        """
+        return {'$or': [{'lease_until': {'$exists': False}},
+                        {'lease_until': None},
+                        {'lease_until': {'$lt': now_ts}}]}
+
+
+    @staticmethod
+    def claim_elapsed_reminders(timestamp, limit: int = 100, lease_secs: int = 300, after_ts: float = None):
+        """claim a bounded batch of elapsed reminders for this worker
+           the reminders stay in the db until they're acknowledged,
+           expired leases are claimable by any worker again
+
+        Args:
+            timestamp (float): all reminders before this timestamp are elapsed
+            limit (int, optional): max size of the claimed batch. Defaults to 100.
+            lease_secs (int, optional): duration of the claim. Defaults to 300.
+            after_ts (float, optional): only claim reminders elapsed after this timestamp. Defaults to None.
+
+        Returns:
+            list: list of claimed reminders, sorted by 'at'
+        """
+
+        now_ts = datetime.utcnow().timestamp()
+        at_range = {'$lt': timestamp} if after_ts is None else {'$lt': timestamp, '$gte': after_ts}
+        # both filters are $or clauses
+        query = {'at': at_range, '$and': [f for f in (Connector._lease_free_filter(now_ts), Connector._shard_filter()) if f]}
+
+        ids = [r['_id'] for r in Connector.db.reminders.find(query, {'_id': 1}).sort('at', pymongo.ASCENDING).limit(limit)]
+
+        return Connector.claim_reminders(ids, lease_secs=lease_secs)
+
+
+    @staticmethod
+    def claim_reminders(reminder_ids: list, lease_secs: int = 300):
+        """claim the given reminders for this worker,
+           reminders leased by other workers or owned by other shards are skipped
+
+        Args:
+            reminder_ids (list): ids of the reminders
+            lease_secs (int, optional): duration of the claim. Defaults to 300.
+
+        Returns:
+            list: list of claimed reminders, sorted by 'at'
+        """
+
+        if not reminder_ids:
+            return []
+
+        now_ts = datetime.utcnow().timestamp()
+        query = {'_id': {'$in': reminder_ids}, '$and': [f for f in (Connector._lease_free_filter(now_ts), Connector._shard_filter()) if f]}
+
+        # re-check the lease, another worker could've claimed some of the ids in the meantime
+        lease_until = now_ts + lease_secs
+        Connector.db.reminders.update_many(query, {'$set': {'claimed_by': Connector.worker_id, 'lease_until': lease_until}})
+
+        rems = Connector.db.reminders.find({'_id': {'$in': reminder_ids}, 'claimed_by': Connector.worker_id, 'lease_until': lease_until})
+        rems = sorted(map(Reminder, rems))
 
         return rems
 
+
     @staticmethod
-    def get_pending_intervals(timestamp):
+    def get_backlog_size(timestamp) -> int:
+        """count the elapsed reminders, which aren't claimed by any worker
 
-        intvl =  list(Connector.db.intervals.find({'at': {'$lt': timestamp}}))
+        Args:
+            timestamp (float): all reminders before this timestamp are elapsed
+        """
+
+        now_ts = datetime.utcnow().timestamp()
+        query = {'at': {'$lt': timestamp}, '$and': [f for f in (Connector._lease_free_filter(now_ts), Connector._shard_filter()) if f]}
+
+        return Connector.db.reminders.count_documents(query)
+
+
+    @staticmethod
+    def ack_reminder(reminder_id):
+        """delete a delivered reminder, which was claimed by this worker
+           reminders which were re-claimed by other workers (expired lease) are not touched
+           guild reminders are moved into the 'delivered' archive, see get_snooze_source
+
+        Returns:
+            bool: True if the reminder was deleted
+        """
+        rem_json = Connector.db.reminders.find_one_and_delete({'_id': reminder_id, 'claimed_by': Connector.worker_id})
+        if not rem_json:
+            return False
+
+        # only channel messages have snooze buttons
+        if rem_json.get('g_id'):
+            rem_json['expires_at'] = datetime.utcnow() + timedelta(seconds=Connector.DELIVERED_RETENTION_SECS)
+            Connector.db.delivered.insert_one(rem_json)
+
+        return True
+
+
+    @staticmethod
+    def get_snooze_source(reminder_id):
+        """get the reminder or interval a snooze button refers to
+
+        Returns:
+            Reminder: delivered reminder or interval, None if not available anymore
+        """
+
+        rem_json = Connector.db.delivered.find_one({'_id': reminder_id})
+        if rem_json:
+            return Reminder(rem_json)
+
+        return Connector.get_interval_by_id(reminder_id) or Connector.get_reminder_by_id(reminder_id)
+
+
+    @staticmethod
+    def retry_reminder(reminder_id, delay_secs: float, error: str=None):
+        """schedule another delivery attempt of a claimed reminder
+           the lease is extended until the retry is due,
+           afterwards the reminder is claimable by any worker
+
+        Args:
+            reminder_id (ObjectId): id of the failed reminder
+            delay_secs (float): backoff until the next attempt
+            error (str, optional): description of the failure. Defaults to None.
+
+        Returns:
+            bool: True if the reminder was rescheduled
+        """
+
+        retry_at = datetime.utcnow().timestamp() + delay_secs
+        action = Connector.db.reminders.update_one({'_id': reminder_id, 'claimed_by': Connector.worker_id},
+                                                   {'$inc': {'attempts': 1},
+                                                    '$set': {'lease_until': retry_at, 'last_error': error}})
+        Connector._notify_scheduler(retry_at)
+        return (action.modified_count > 0)
+
+
+    @staticmethod
+    def dead_letter_reminder(reminder: Reminder, error: str=None):
+        """move a claimed reminder, which exhausted all delivery attempts,
+           into the dead letter collection
+
+        Returns:
+            bool: True if the reminder was moved
+        """
+
+        rem_json = Connector.db.reminders.find_one_and_delete({'_id': reminder._id, 'claimed_by': Connector.worker_id})
+        if not rem_json:
+            return False
+
+        rem_json['last_error'] = error
+        rem_json['failed_at'] = datetime.utcnow().timestamp()
+        rem_json['attempts'] = rem_json.get('attempts', 0) + 1
+        Connector.db.dead_letters.insert_one(rem_json)
+
+        return True
+
+
+    @staticmethod
+    def release_reminders(reminder_ids: list):
+        """return claimed reminders to the queue
+           without waiting for the lease to expire
+
+        Returns:
+            int: number of released reminders
+        """
+        action = Connector.db.reminders.update_many({'_id': {'$in': reminder_ids}, 'claimed_by': Connector.worker_id},
+                                                   {'$unset': {'claimed_by': '', 'lease_until': ''}})
+        return action.modified_count
+
+
+    @staticmethod
+    def restore_interval_at(intervals: list):
+        """reset rescheduled intervals to their previous trigger time,
+           used for occurrences which were never delivered
+           intervals which were edited in the meantime are not touched
+
+        Args:
+            intervals (list): list of (interval_id, rescheduled_at, original_at) tuples,
+                              the trigger times are utc datetimes, rescheduled_at is None for orphaned intervals
+
+        Returns:
+            int: number of restored intervals
+        """
+
+        cnt = 0
+        for interval_id, rescheduled_at, original_at in intervals:
+            # stored as timestamps, see Reminder._to_json
+            rescheduled_ts = datetime.timestamp(rescheduled_at) if rescheduled_at else None
+            original_ts = datetime.timestamp(original_at) if original_at else None
+
+            action = Connector.db.intervals.update_one({'_id': interval_id, 'at': rescheduled_ts}, {'$set': {'at': original_ts}})
+            cnt += action.modified_count
+
+        return cnt
+
+
+    @staticmethod
+    def save_checkpoint(reminder_ids: list, interval_ids: list):
+        """persist the undelivered reminders of a drained worker,
+           the next worker delivers them before any other reminder
+        """
+
+        if not reminder_ids and not interval_ids:
+            return
+
+        Connector.db.checkpoints.insert_one({'worker': Connector.worker_id,
+                                             'shard_ids': Connector.shard_ids,
+                                             'created_at': datetime.utcnow().timestamp(),
+                                             'reminders': reminder_ids,
+                                             'intervals': interval_ids})
+
+
+    @staticmethod
+    def take_checkpoints():
+        """remove all stored checkpoints sharing a shard with this worker,
+           each checkpoint is only returned to a single worker
+
+           the shards can be split differently than on the drained worker,
+           ids of foreign shards are skipped by the claim
+           they were released by the drain and are delivered by the regular passes of their shard
+
+        Returns:
+            tuple: (reminder_ids, interval_ids) of all checkpoints
+        """
+
+        if Connector.shard_ids:
+            # checkpoints of workers serving all shards overlap with every worker
+            query = {'$or': [{'shard_ids': None}, {'shard_ids': {'$in': Connector.shard_ids}}]}
+        else:
+            query = {}
+
+        reminder_ids, interval_ids = [], []
+
+        while True:
+            checkpoint = Connector.db.checkpoints.find_one_and_delete(query, sort=[('created_at', pymongo.ASCENDING)])
+            if not checkpoint:
+                break
+
+            reminder_ids.extend(checkpoint.get('reminders', []))
+            interval_ids.extend(checkpoint.get('intervals', []))
+
+        return reminder_ids, interval_ids
+
+
+    @staticmethod
+    def get_pending_intervals(timestamp, limit: int = 0):
+        """get the elapsed intervals, sorted by 'at'
+
+        Args:
+            timestamp (float): all intervals before this timestamp are elapsed
+            limit (int, optional): max number of intervals, 0 for no limit. Defaults to 0.
+        """
+
+        intvl =  list(Connector.db.intervals.find({'at': {'$lt': timestamp}, **Connector._shard_filter()}).sort('at', pymongo.ASCENDING).limit(limit))
         intvl = list(map(IntervalReminder, intvl))
 
         return intvl
 
 
+    @staticmethod
+    def mark_channel_dead(channel_id: int):
+        """mark all reminders and intervals of a deleted channel,
+           their deliveries fall back to a DM without resolving the channel
+
+        Returns:
+            int: number of marked reminders and intervals
+        """
+
+        cnt = 0
+        for coll in (Connector.db.reminders, Connector.db.intervals):
+            cnt += coll.update_many({'ch_id': str(channel_id)}, {'$set': {'ch_dead': True}}).modified_count
+
+        return cnt
+
+
+    @staticmethod
+    def get_dm_channel_id(user_id: int) -> int:
+        """get the id of the dm channel with the user, None if unknown"""
+
+        doc = Connector.db.dm_channels.find_one({'_id': str(user_id)}, {'ch_id': 1})
+        return int(doc['ch_id']) if doc else None
+
+
+    @staticmethod
+    def set_dm_channel_id(user_id: int, channel_id: int):
+        Connector.db.dm_channels.update_one({'_id': str(user_id)}, {'$set': {'ch_id': str(channel_id)}}, upsert=True)
+
+
     @staticmethod
     def get_reminder_cnt():
         return Connector.db.reminders.count_documents({})
@@ -524,6 +1269,7 @@ class Connector:
         """change the channel id of a given reminder
            method tries to find reminder, if not exists
            method will assume an interval
+           a dead channel marker is removed
 
         Args:
             reminder_id (ObjectId): reminder/interval ID
@@ -535,25 +1281,25 @@ class Connector:
         # upsert with channel_name
         if channel_name:
             result = Connector.db.reminders.find_one_and_update({'_id': reminder_id}, 
-                                                            {'$set': {'ch_id': str(channel_id), 'ch_name': str(channel_name)}}, 
+                                                            {'$set': {'ch_id': str(channel_id), 'ch_name': str(channel_name)}, '$unset': {'ch_dead': ''}}, 
                                                             new=False, 
                                                             upsert=False)
             if not result:
                 result = Connector.db.intervals.find_one_and_update({'_id': reminder_id}, 
-                                                                {'$set': {'ch_id': str(channel_id), 'ch_name': str(channel_name)}}, 
+                                                                {'$set': {'ch_id': str(channel_id), 'ch_name': str(channel_name)}, '$unset': {'ch_dead': ''}}, 
                                                                 new=False, 
                                                                 upsert=False)
 
         # upsert without channel name
         else:
             result = Connector.db.reminders.find_one_and_update({'_id': reminder_id}, 
-                                                            {'$set': {'ch_id': str(channel_id)}}, 
+                                                            {'$set': {'ch_id': str(channel_id)}, '$unset': {'ch_dead': ''}}, 
                                                             new=False, 
                                                             upsert=False)
         
             if not result:
                 result = Connector.db.intervals.find_one_and_update({'_id': reminder_id}, 
-                                                                    {'$set': {'ch_id': str(channel_id)}}, 
+                                                                    {'$set': {'ch_id': str(channel_id)}, '$unset': {'ch_dead': ''}}, 
                                                                     new=False, 
                                                                     upsert=False)
             
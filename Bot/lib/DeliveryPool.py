@@ -0,0 +1,61 @@
+import asyncio
+from typing import Callable, Awaitable
+
+
+
+class DeliveryPool:
+    """deliver a batch of items with bounded concurrency
+       items sharing the same key are delivered sequentially,
+       in the order they were passed, e.g. all reminders of a channel
+    """
+
+    def __init__(self, concurrency: int):
+        """
+        Args:
+            concurrency (int): max number of deliveries running at the same time
+        """
+        self.concurrency = max(1, concurrency)
+        self.in_flight = 0
+
+
+    async def run(self, items: list, deliver: Callable[[object], Awaitable], key: Callable[[object], object]=None, on_error: Callable[[object, Exception], None]=None) -> int:
+        """deliver all items, returns once every item was processed
+           a failing item doesn't affect the remaining items
+
+        Args:
+            items (list): items to deliver
+            deliver (Callable): coroutine function delivering a single item
+            key (Callable, optional): ordering key of an item, no ordering if None. Defaults to None.
+            on_error (Callable, optional): called with the item and the raised exception. Defaults to None.
+
+        Returns:
+            int: number of failed items
+        """
+
+        # dicts keep the insertion order, lanes are started in order of their first item
+        lanes = {}
+        for i, item in enumerate(items):
+            lane_key = key(item) if key else i
+            lanes.setdefault(lane_key, []).append(item)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        failed = 0
+
+        async def run_lane(lane):
+            nonlocal failed
+
+            for item in lane:
+                # acquired per item, long lanes don't block other channels
+                async with semaphore:
+                    self.in_flight += 1
+                    try:
+                        await deliver(item)
+                    except Exception as e:
+                        failed += 1
+                        if on_error:
+                            on_error(item, e)
+                    finally:
+                        self.in_flight -= 1
+
+        await asyncio.gather(*(run_lane(lane) for lane in lanes.values()))
+        return failed
@@ -0,0 +1,68 @@
+import os
+
+import pymongo
+
+from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
+
+
+import logging
+
+
+
+log = logging.getLogger('Remindme.Leader')
+
+
+
+class LeaderElection:
+    """lease based leader election across all bot processes
+       the leader runs the singleton maintenance loops (counters, cleanups)
+
+       the lease must be renewed more often than it expires,
+       if the leader stops renewing, another process takes over once the lease expired
+    """
+
+    LOCK_NAME = 'maintenance_leader'
+
+    # renew interval should be well below the lease duration
+    LEASE_SECS = int(os.getenv('LEADER_LEASE_SECS', '60'))
+    RENEW_SECS = int(os.getenv('LEADER_RENEW_SECS', '20'))
+
+    is_leader = False
+
+
+    @staticmethod
+    async def renew() -> bool:
+        """acquire or renew the leadership of this process
+
+        Returns:
+            bool: True if this process is the leader
+        """
+
+        try:
+            leader = await AsyncConnector.acquire_lock(LeaderElection.LOCK_NAME, Connector.worker_id, LeaderElection.LEASE_SECS)
+        except pymongo.errors.PyMongoError as e:
+            # the lease might be lost already, don't risk two leaders
+            log.error(f'failed to renew leadership: {e}')
+            leader = False
+
+        if leader != LeaderElection.is_leader:
+            log.info('acquired leadership' if leader else 'lost leadership')
+
+        LeaderElection.is_leader = leader
+        return leader
+
+
+    @staticmethod
+    async def resign():
+        """give up the leadership, another process can take over immediately"""
+
+        if LeaderElection.is_leader:
+            LeaderElection.is_leader = False
+            try:
+                await AsyncConnector.release_lock(LeaderElection.LOCK_NAME, Connector.worker_id)
+            except pymongo.errors.PyMongoError as e:
+                # the lease expires on its own
+                log.error(f'failed to resign leadership: {e}')
+                return
+            log.info('resigned leadership')
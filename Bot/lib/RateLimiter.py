@@ -0,0 +1,117 @@
+import time
+import asyncio
+
+
+
+class TokenBucket:
+    """token bucket supporting reservations
+       tokens can become negative, the deficit is the queue in front of the next caller
+    """
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate (float): refilled tokens per second
+            burst (int): bucket capacity
+        """
+        self.rate = rate
+        self.burst = burst
+
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+    def reserve(self, now: float=None) -> float:
+        """take a token, even if the bucket is empty
+
+        Returns:
+            float: seconds until the reserved token is available
+        """
+
+        self._refill(now if now is not None else time.monotonic())
+        self.tokens -= 1
+
+        return max(0.0, -self.tokens / self.rate)
+
+
+    def is_idle(self, now: float=None) -> bool:
+        self._refill(now if now is not None else time.monotonic())
+        return self.tokens >= self.burst
+
+
+
+class RateLimiter:
+    """schedule requests to stay below known rate limits
+       every route (e.g. a channel) has its own bucket, routes of the same kind
+       share their limits, all routes share an additional global bucket
+    """
+
+    def __init__(self, limits: dict, global_limit: tuple, max_routes: int=10000):
+        """
+        Args:
+            limits (dict): (rate, burst) by route kind
+            global_limit (tuple): (rate, burst) of the global bucket
+            max_routes (int, optional): idle buckets are dropped above this count. Defaults to 10000.
+        """
+        self.limits = limits
+        self.max_routes = max_routes
+
+        self.global_bucket = TokenBucket(*global_limit)
+        self._buckets = {}
+
+        self.queued = 0
+
+
+    def _get_bucket(self, kind, route_id) -> TokenBucket:
+        key = (kind, route_id)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_routes:
+                self._prune()
+
+            bucket = TokenBucket(*self.limits[kind])
+            self._buckets[key] = bucket
+
+        return bucket
+
+
+    def _prune(self):
+        # a full bucket behaves like a new one
+        now = time.monotonic()
+        self._buckets = {k: b for k, b in self._buckets.items() if not b.is_idle(now)}
+
+
+    async def acquire(self, routes: list) -> float:
+        """wait until a request on all given routes is allowed
+           the route buckets are acquired in order, the global bucket last
+
+        Args:
+            routes (list): list of (kind, route_id) tuples
+
+        Returns:
+            float: seconds spent waiting
+        """
+
+        start = time.monotonic()
+        self.queued += 1
+
+        try:
+            for kind, route_id in routes:
+                wait = self._get_bucket(kind, route_id).reserve()
+                if wait:
+                    await asyncio.sleep(wait)
+
+            # reserved last, a request waiting on its route doesn't hold global tokens
+            wait = self.global_bucket.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+        finally:
+            self.queued -= 1
+
+        return time.monotonic() - start
@@ -1,4 +1,6 @@
 from dis import dis
+import os
+import hashlib
 import discord # for reminder
 from datetime import datetime
 from dateutil import tz
@@ -6,6 +8,32 @@ import dateutil.rrule as rr
 
 import lib.input_parser
 import lib.Connector  # KEEP this syntax, circular import
+from lib.Cache import LRUCache
+from lib.Resolver import Resolver
+
+
+# compiled rulesets by rule fingerprint, shared by all intervals
+# the cached objects must not be modified
+RULESET_CACHE = LRUCache(maxsize=int(os.getenv('RULESET_CACHE_SIZE', '4096')))
+# parsed rrule strings, identical rules are common across guilds
+RRULE_CACHE = LRUCache(maxsize=int(os.getenv('RRULE_CACHE_SIZE', '4096')))
+
+
+def _register_cache_access(cache_name: str, hit: bool):
+    import lib.Analytics  # circular import, Analytics depends on this module
+    lib.Analytics.Analytics.ruleset_cache_access(cache_name, hit)
+
+
+def _parse_rrule(rule_str: str) -> rr.rrule:
+    rule = RRULE_CACHE.get(rule_str)
+    _register_cache_access('rrule', rule is not None)
+
+    if rule is None:
+        rule = rr.rrulestr(rule_str)
+        RRULE_CACHE.set(rule_str, rule)
+
+    return rule
+
 
 class Reminder:
 
@@ -31,6 +59,8 @@ class Reminder:
         self.target_mention = json.get('target_mention', None)
         self.target_name = json.get('target_name', None)
         self.ch_name = json.get('ch_name', None)
+        # the channel was deleted, see Connector.mark_channel_dead
+        self.ch_dead = json.get('ch_dead', False)
 
         author = json.get('author', None)
         self.author = int(author) if author else None
@@ -46,6 +76,9 @@ class Reminder:
         if self.created_at:
             self.created_at = datetime.fromtimestamp(self.created_at)
 
+        # failed delivery attempts, see Connector.retry_reminder
+        self.attempts = json.get('attempts', 0)
+
 
     def __eq__(self, other):
         # equals allows None
@@ -93,9 +126,20 @@ class Reminder:
         else:
             d['at'] = None
 
+        d['shard_key'] = self.get_shard_key()
+
         return d
 
 
+    def get_shard_key(self):
+        """partition key used to split the delivery across processes
+           discord assigns a guild to the shard (g_id >> 22) % shard_count,
+           DMs are partitioned by their author
+           the modulo is applied when querying, a changed shard count doesn't require a migration
+        """
+        return (self.g_id or self.author or 0) >> 22
+
+
     
     def get_interval_string(self, now=None, use_timestamp=False):
         """get a string describing the interval until reminder is triggered
@@ -160,10 +204,7 @@ class Reminder:
         # if the author is actually required
         author = None
         if self.author != self.target:
-            try:
-                author = await client.fetch_user(self.author)
-            except discord.errors.NotFound:
-                pass
+            author = await Resolver.fetch_user(client, self.author)
 
         if not is_dm:
             out_str = self.target_mention or f'<@!{self.target}>'
@@ -283,12 +324,8 @@ class Reminder:
         """
 
         if self.target != self.author:
-            try:
-                author = await client.fetch_user(self.author)
-                title = 'Reminds you'
-            except discord.errors.NotFound:
-                author = None
-                title = f'Reminder'
+            author = await Resolver.fetch_user(client, self.author)
+            title = 'Reminds you' if author else f'Reminder'
         else:
             author = None
             title = f'Reminder'
@@ -330,6 +367,11 @@ class Reminder:
         return tmp
 
 class IntervalReminder(Reminder):
+
+    # number of precomputed occurrences
+    # a refill is due once less than UPCOMING_LOW are left
+    UPCOMING_CNT = 10
+    UPCOMING_LOW = 3
     
     def __init__(self, json = {}):
         if not json:
@@ -337,6 +379,13 @@ class IntervalReminder(Reminder):
 
         super().__init__(json)
 
+        # next occurrences in utc, only valid if the key matches the current rules
+        # complete is set if no further occurrences exist
+        upcoming = json.get('upcoming', None) or {}
+        self.upcoming_key = upcoming.get('key', None)
+        self.upcoming = [datetime.fromtimestamp(at) for at in upcoming.get('at', [])]
+        self.upcoming_complete = upcoming.get('complete', False)
+
 
         self.first_at = json.get('first_at', None)
         if self.first_at:
@@ -359,6 +408,10 @@ class IntervalReminder(Reminder):
         if self.first_at:
             d['first_at'] = datetime.timestamp(self.first_at)
 
+        d['upcoming'] = {'key': self.upcoming_key,
+                         'at': [datetime.timestamp(at) for at in self.upcoming],
+                         'complete': self.upcoming_complete}
+
         return d
 
 
@@ -526,10 +579,58 @@ class IntervalReminder(Reminder):
         return
 
 
-    def next_trigger(self, utcnow, tz_str=None):
+    def _resolve_mode(self, tz_str=None, legacy_mode=None):
+        """get the timezone the rules are evaluated in
+           the settings are only queried if not given
+
+        Returns:
+            tuple(str, bool): timezone (None in legacy mode), legacy mode
+        """
 
         instance_id = self.g_id if self.g_id else self.author
-        legacy_mode = lib.Connector.Connector.is_legacy_interval(instance_id)
+
+        if legacy_mode is None:
+            legacy_mode = lib.Connector.Connector.is_legacy_interval(instance_id)
+
+        if legacy_mode:
+            return (None, True)
+
+        if not tz_str:
+            tz_str = lib.Connector.Connector.get_timezone(instance_id)
+
+        return (tz_str, False)
+
+
+    def _get_rule_repr(self) -> str:
+        return repr((self.rrules, self.exrules, self.rdates, self.exdates, self.first_at))
+
+
+    def _get_fingerprint(self, tz_str, legacy_mode) -> str:
+        # identifies the inputs of the occurrence calculation
+        # any change of the rules or settings invalidates the precomputed occurrences
+        rule_repr = repr((self._get_rule_repr(), tz_str, legacy_mode))
+        return hashlib.sha1(rule_repr.encode()).hexdigest()
+
+
+    def _get_ruleset(self) -> rr.rruleset:
+        """get the compiled ruleset of this interval
+           the ruleset is independent of the timezone,
+           it's shared with all intervals using the same rules
+        """
+
+        key = hashlib.sha1(self._get_rule_repr().encode()).hexdigest()
+
+        ruleset = RULESET_CACHE.get(key)
+        _register_cache_access('ruleset', ruleset is not None)
+
+        if ruleset is None:
+            ruleset = self._compile_ruleset()
+            RULESET_CACHE.set(key, ruleset)
+
+        return ruleset
+
+
+    def _compile_ruleset(self) -> rr.rruleset:
 
         ruleset = rr.rruleset()
 
@@ -539,10 +640,10 @@ class IntervalReminder(Reminder):
         ruleset.rdate(self.first_at)
 
         for rule in self.rrules:
-            ruleset.rrule(rr.rrulestr(rule))
+            ruleset.rrule(_parse_rrule(rule))
 
         for rule in self.exrules:
-            ruleset.exrule(rr.rrulestr(rule))
+            ruleset.exrule(_parse_rrule(rule))
 
         for date in self.rdates:
             ruleset.rdate(date)
@@ -550,28 +651,97 @@ class IntervalReminder(Reminder):
         for date in self.exdates:
             ruleset.exdate(date)
 
+        return ruleset
 
-        if not legacy_mode:
-            # the local time must be used
-            # to determin the next event
-            if not tz_str:
-                tz_str = lib.Connector.Connector.get_timezone(instance_id)
 
-            local_now = utcnow.replace(tzinfo=tz.UTC)
-            local_now = local_now.astimezone(tz.gettz(tz_str))
-            local_now = local_now.replace(tzinfo=None)
-            
-            next_trigger = ruleset.after(local_now)
-            
-            if next_trigger:
-                # back to UTC, for DB queries
-                next_trigger = next_trigger.replace(tzinfo=tz.gettz(tz_str))
-                next_trigger = next_trigger.astimezone(tz.UTC)
-                next_trigger = next_trigger.replace(tzinfo=None)
-            
+    def _get_occurrences(self, utc_after, tz_str, count) -> list:
+        """calculate the next occurrences after the given time
+
+        Args:
+            utc_after (datetime): exclusive start
+            tz_str (str): timezone of the rules, None for legacy mode (utc)
+            count (int): max number of occurrences
+
+        Returns:
+            list: utc datetimes, less than count if the rules have no further occurrences
+        """
+
+        ruleset = self._get_ruleset()
+
+        if not tz_str:
+            return list(ruleset.xafter(utc_after, count=count))
+
+        # the local time must be used
+        # to determin the next event
+        local_after = utc_after.replace(tzinfo=tz.UTC)
+        local_after = local_after.astimezone(tz.gettz(tz_str))
+        local_after = local_after.replace(tzinfo=None)
+
+        occurrences = []
+        for occurrence in ruleset.xafter(local_after, count=count):
+            # back to UTC, for DB queries
+            occurrence = occurrence.replace(tzinfo=tz.gettz(tz_str))
+            occurrence = occurrence.astimezone(tz.UTC)
+            occurrences.append(occurrence.replace(tzinfo=None))
+
+        return occurrences
+
+
+    def _fill_upcoming(self, utcnow, tz_str, key):
+        self.upcoming = self._get_occurrences(utcnow, tz_str, IntervalReminder.UPCOMING_CNT)
+        self.upcoming_complete = len(self.upcoming) < IntervalReminder.UPCOMING_CNT
+        self.upcoming_key = key
+
+
+    def next_trigger(self, utcnow, tz_str=None, legacy_mode=None):
+        """get the next occurrence after utcnow
+           served from the precomputed occurrences if they're still valid
+
+        Args:
+            utcnow (datetime): exclusive start
+            tz_str (str, optional): timezone of the instance, queried if None. Defaults to None.
+            legacy_mode (bool, optional): legacy interval mode of the instance, queried if None. Defaults to None.
+
+        Returns:
+            datetime: next occurrence in utc, None if there are no further occurrences
+        """
+
+        tz_str, legacy_mode = self._resolve_mode(tz_str, legacy_mode)
+        key = self._get_fingerprint(tz_str, legacy_mode)
+
+        if key != self.upcoming_key:
+            self._fill_upcoming(utcnow, tz_str, key)
         else:
-            next_trigger = ruleset.after(utcnow)
+            self.upcoming = [at for at in self.upcoming if at > utcnow]
 
-    
-            
-        return next_trigger
+            if not self.upcoming and not self.upcoming_complete:
+                self._fill_upcoming(utcnow, tz_str, key)
+
+        return self.upcoming[0] if self.upcoming else None
+
+
+    def needs_refill(self) -> bool:
+        """check if the precomputed occurrences are running low"""
+        return self.upcoming_key is not None and not self.upcoming_complete and\
+                len(self.upcoming) < IntervalReminder.UPCOMING_LOW
+
+
+    def refill_upcoming(self, tz_str=None, legacy_mode=None):
+        """extend the precomputed occurrences up to UPCOMING_CNT
+           invalid occurrences are recalculated from the current time
+        """
+
+        tz_str, legacy_mode = self._resolve_mode(tz_str, legacy_mode)
+        key = self._get_fingerprint(tz_str, legacy_mode)
+
+        if key != self.upcoming_key or not self.upcoming:
+            self._fill_upcoming(datetime.utcnow(), tz_str, key)
+            return
+
+        missing = IntervalReminder.UPCOMING_CNT - len(self.upcoming)
+        if missing <= 0:
+            return
+
+        occurrences = self._get_occurrences(self.upcoming[-1], tz_str, missing)
+        self.upcoming += occurrences
+        self.upcoming_complete = len(occurrences) < missing
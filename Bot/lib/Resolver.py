@@ -0,0 +1,199 @@
+import os
+import asyncio
+
+import discord
+
+from lib.Cache import LRUCache
+
+
+import logging
+
+
+
+log = logging.getLogger('Remindme.Resolver')
+
+
+_MISSING = object()
+
+
+def _register_lookup(kind: str, source: str):
+    import lib.Analytics  # circular import, Analytics depends on the Reminder module
+    lib.Analytics.Analytics.resolver_lookup(kind, source)
+
+
+
+class Resolver:
+    """resolve discord objects with as few REST requests as possible
+       the gateway cache is preferred, fetched objects are cached process-wide
+       objects which don't exist are cached as None for a shorter time
+       concurrent lookups of the same object share a single request
+    """
+
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '3600'))
+    # deleted users don't come back, but a wrong id might be edited
+    NEGATIVE_TTL = int(os.getenv('RESOLVER_NEGATIVE_TTL', '300'))
+
+    # dm channel ids never change, the entries don't expire
+    DM_CHANNEL_CACHE_SIZE = int(os.getenv('DM_CHANNEL_CACHE_SIZE', '50000'))
+
+    # fetched channels are archived threads, which can be unarchived any time
+    CHANNEL_CACHE_SIZE = int(os.getenv('CHANNEL_CACHE_SIZE', '10000'))
+    CHANNEL_CACHE_TTL = int(os.getenv('CHANNEL_CACHE_TTL', '300'))
+
+    users = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+    _pending_users = {}
+
+    channels = LRUCache(maxsize=CHANNEL_CACHE_SIZE, ttl=CHANNEL_CACHE_TTL)
+    _pending_channels = {}
+
+    dm_channels = LRUCache(maxsize=DM_CHANNEL_CACHE_SIZE)
+
+
+    @staticmethod
+    async def fetch_user(client: discord.Client, user_id) -> discord.User:
+        """get the user from the gateway cache, the resolver cache or the api
+
+        Args:
+            client (discord.Client): bot client
+            user_id (int|str): id of the user
+
+        Raises:
+            discord.errors.HTTPException: the api request failed
+
+        Returns:
+            discord.User: the user, None if the user doesn't exist
+        """
+
+        user_id = int(user_id)
+
+        user = client.get_user(user_id)
+        if user:
+            _register_lookup('user', 'gateway')
+            return user
+
+        user = Resolver.users.get(user_id, _MISSING)
+        if user is not _MISSING:
+            _register_lookup('user', 'cache' if user else 'negative')
+            return user
+
+        return await Resolver._fetch_once(Resolver._pending_users, user_id, lambda: Resolver._fetch_user(client, user_id), 'user')
+
+
+    @staticmethod
+    async def _fetch_once(pending: dict, key, fetch, kind: str):
+        """run the fetch coroutine, unless a fetch of the same key is already running"""
+
+        future = pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fetch())
+            pending[key] = future
+            future.add_done_callback(lambda _: pending.pop(key, None))
+        else:
+            _register_lookup(kind, 'coalesced')
+
+        # a cancelled caller must not cancel the request of the other callers
+        return await asyncio.shield(future)
+
+
+    @staticmethod
+    async def _fetch_user(client: discord.Client, user_id: int) -> discord.User:
+        _register_lookup('user', 'rest')
+
+        try:
+            user = await client.fetch_user(user_id)
+        except discord.errors.NotFound:
+            Resolver.users.set(user_id, None, ttl=Resolver.NEGATIVE_TTL)
+            return None
+
+        Resolver.users.set(user_id, user)
+        return user
+
+
+    @staticmethod
+    async def get_channel(client: discord.Client, guild: discord.Guild, channel_id: int):
+        """get a channel or thread of the guild
+           archived threads aren't part of the gateway cache and are fetched,
+           channels which don't exist or can't be accessed are cached as None
+           deleted channels are marked as dead in the db
+
+        Args:
+            client (discord.Client): bot client
+            guild (discord.Guild): guild of the channel
+            channel_id (int): id of the channel
+
+        Returns:
+            discord.abc.GuildChannel|discord.Thread: the channel, None if unavailable
+        """
+
+        channel = guild.get_channel_or_thread(channel_id)
+        if channel:
+            _register_lookup('channel', 'gateway')
+            return channel
+
+        channel = Resolver.channels.get(channel_id, _MISSING)
+        if channel is not _MISSING:
+            _register_lookup('channel', 'cache' if channel else 'negative')
+            return channel
+
+        return await Resolver._fetch_once(Resolver._pending_channels, channel_id, lambda: Resolver._fetch_channel(client, channel_id), 'channel')
+
+
+    @staticmethod
+    async def _fetch_channel(client: discord.Client, channel_id: int):
+        _register_lookup('channel', 'rest')
+
+        try:
+            channel = await client.fetch_channel(channel_id)
+        except discord.errors.NotFound:
+            Resolver.channels.set(channel_id, None, ttl=Resolver.NEGATIVE_TTL)
+
+            import lib.AsyncConnector  # circular import, the Connector depends on the Reminder module
+            cnt = await lib.AsyncConnector.AsyncConnector.mark_channel_dead(channel_id)
+            log.debug(f'channel {channel_id} not found, marked {cnt} reminder(s)')
+            return None
+        except discord.errors.Forbidden:
+            Resolver.channels.set(channel_id, None, ttl=Resolver.NEGATIVE_TTL)
+            return None
+
+        Resolver.channels.set(channel_id, channel)
+        return channel
+
+
+    @staticmethod
+    async def get_dm_channel(client: discord.Client, user: discord.User) -> discord.abc.Messageable:
+        """get a messageable dm channel of the user
+           the channel id is looked up in memory and in the db,
+           only unknown channels are created with an api request
+
+        Args:
+            client (discord.Client): bot client
+            user (discord.User): recipient of the dm
+
+        Returns:
+            discord.abc.Messageable: dm channel or a partial messageable of it
+        """
+
+        if user.dm_channel:
+            _register_lookup('dm_channel', 'gateway')
+            return user.dm_channel
+
+        import lib.AsyncConnector  # circular import, the Connector depends on the Reminder module
+
+        ch_id = Resolver.dm_channels.get(user.id)
+        if ch_id:
+            _register_lookup('dm_channel', 'cache')
+        else:
+            ch_id = await lib.AsyncConnector.AsyncConnector.get_dm_channel_id(user.id)
+            if ch_id:
+                _register_lookup('dm_channel', 'db')
+
+        if not ch_id:
+            _register_lookup('dm_channel', 'rest')
+            dm = await user.create_dm()
+            await lib.AsyncConnector.AsyncConnector.set_dm_channel_id(user.id, dm.id)
+            Resolver.dm_channels.set(user.id, dm.id)
+            return dm
+
+        Resolver.dm_channels.set(user.id, ch_id)
+        return client.get_partial_messageable(ch_id, type=discord.ChannelType.private)
@@ -0,0 +1,149 @@
+import heapq
+import asyncio
+import threading
+
+
+
+class Scheduler:
+    """min-heap of upcoming trigger timestamps
+       the heap only decides when the database is queried for due reminders,
+       the database remains the source of truth for what is delivered
+
+       the heap covers all timestamps up to the horizon of the last refill,
+       later timestamps are loaded by the next refill
+       stale entries (deleted or edited reminders) only cause a spurious query
+    """
+
+    def __init__(self):
+        self.horizon = 0
+
+        self._heap = []
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+
+
+    def __len__(self):
+        return len(self._heap)
+
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """bind the scheduler to the event loop running wait()
+           must be called from within the loop
+        """
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+
+
+    def schedule(self, at_ts: float):
+        """add a trigger time, can be called from any thread
+
+        Args:
+            at_ts (float): utc timestamp of the trigger, None is ignored
+        """
+
+        if at_ts is None:
+            return
+
+        with self._lock:
+            if at_ts > self.horizon:
+                # outside of the preloaded window
+                return
+
+            is_next = not self._heap or at_ts < self._heap[0]
+            heapq.heappush(self._heap, at_ts)
+
+        if is_next:
+            self._notify()
+
+
+    def refill(self, timestamps: list, horizon: float):
+        """merge the trigger times of a new window into the heap
+
+        Args:
+            timestamps (list): utc timestamps up to the horizon
+            horizon (float): end of the loaded window
+        """
+
+        with self._lock:
+            self.horizon = horizon
+            self._heap = list(set(self._heap).union(timestamps))
+            heapq.heapify(self._heap)
+
+        self._notify()
+
+
+    def next_deadline(self) -> float:
+        """
+        Returns:
+            float: earliest trigger time, None if the heap is empty
+        """
+        with self._lock:
+            return self._heap[0] if self._heap else None
+
+
+    def is_stale(self, now_ts: float) -> bool:
+        """the horizon elapsed without a refill,
+           trigger times after the horizon were dropped and the heap is incomplete
+
+        Args:
+            now_ts (float): current utc timestamp
+        """
+        return now_ts >= self.horizon
+
+
+    def pop_due(self, now_ts: float) -> int:
+        """remove all elapsed trigger times
+
+        Args:
+            now_ts (float): current utc timestamp
+
+        Returns:
+            int: number of elapsed trigger times
+        """
+
+        cnt = 0
+        with self._lock:
+            while self._heap and self._heap[0] <= now_ts:
+                heapq.heappop(self._heap)
+                cnt += 1
+
+        return cnt
+
+
+    async def wait(self, now_ts: float, max_sleep: float):
+        """sleep until the earliest trigger time elapses,
+           an earlier trigger time is scheduled or max_sleep is reached
+
+        Args:
+            now_ts (float): current utc timestamp
+            max_sleep (float): upper bound of the sleep in seconds
+        """
+
+        # clear before reading the heap
+        # a concurrent schedule() will therefore always wake this call
+        self._wakeup.clear()
+
+        deadline = self.next_deadline()
+        timeout = max_sleep if deadline is None else min(max_sleep, max(0, deadline - now_ts))
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+    def wake(self):
+        """interrupt a running wait() without scheduling a trigger time"""
+        self._notify()
+
+
+    def _notify(self):
+        if self._loop is None:
+            return
+
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # loop is already closed
+            pass
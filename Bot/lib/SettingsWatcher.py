@@ -0,0 +1,112 @@
+import os
+import threading
+
+import pymongo
+
+from lib.Connector import Connector
+
+
+import logging
+
+
+
+log = logging.getLogger('Remindme.Connector')
+
+
+
+class SettingsWatcher:
+    """evict cached settings which were changed by another process
+       a change stream on the settings collection is used if available,
+       single-node deployments without a replica set fall back to
+       polling the settings changelog of the meta collection
+    """
+
+    # mongo error code if change streams are not supported
+    NO_REPLICA_SET = 40573
+
+    thread = None
+    _stop = threading.Event()
+
+
+    @staticmethod
+    def start():
+        if SettingsWatcher.thread and SettingsWatcher.thread.is_alive():
+            return
+
+        SettingsWatcher._stop.clear()
+        SettingsWatcher.thread = threading.Thread(target=SettingsWatcher._run, name='settings-watcher', daemon=True)
+        SettingsWatcher.thread.start()
+
+
+    @staticmethod
+    def stop():
+        SettingsWatcher._stop.set()
+
+
+    @staticmethod
+    def _run():
+        retry_interval = float(os.getenv('SETTINGS_POLL_INTERVAL', '5'))
+
+        while not SettingsWatcher._stop.is_set():
+            try:
+                SettingsWatcher._watch()
+            except pymongo.errors.OperationFailure as e:
+                if e.code == SettingsWatcher.NO_REPLICA_SET:
+                    log.warning('settings change stream not supported, falling back to polling')
+                    SettingsWatcher._poll()
+                    return
+                log.error(f'settings change stream failed: {e}')
+            except pymongo.errors.PyMongoError as e:
+                log.error(f'settings change stream failed: {e}')
+
+            # events might have been missed while the stream was down
+            Connector.invalidate_settings()
+            SettingsWatcher._stop.wait(retry_interval)
+
+
+    @staticmethod
+    def _watch():
+        with Connector.db.settings.watch(full_document='updateLookup', max_await_time_ms=1000) as stream:
+            # settings cached before the stream was opened could be stale already
+            Connector.invalidate_settings()
+            log.info('watching settings for changes')
+
+            while not SettingsWatcher._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    SettingsWatcher._on_change(change)
+
+
+    @staticmethod
+    def _on_change(change: dict):
+        doc = change.get('fullDocument')
+
+        if change['operationType'] in ('insert', 'update', 'replace') and doc and 'g_id' in doc:
+            Connector.invalidate_settings(doc['g_id'])
+        else:
+            # deletes only report the _id, the affected instance is unknown
+            Connector.invalidate_settings()
+
+
+    @staticmethod
+    def _poll():
+        interval = float(os.getenv('SETTINGS_POLL_INTERVAL', '5'))
+        seen = None
+
+        while not SettingsWatcher._stop.wait(0 if seen is None else interval):
+            try:
+                version, recent = Connector.get_settings_changelog()
+            except pymongo.errors.PyMongoError as e:
+                log.error(f'failed to poll the settings changelog: {e}')
+                seen = None
+                SettingsWatcher._stop.wait(interval)
+                continue
+
+            if seen is None or version < seen or version - seen > len(recent):
+                # first poll, reset changelog or too many changes since the last poll
+                Connector.invalidate_settings()
+            else:
+                for instance_id in recent[len(recent) - (version - seen):]:
+                    Connector.invalidate_settings(instance_id)
+
+            seen = version
@@ -25,7 +25,7 @@ def check_user_permission(guild_id: int, user_roles: list, required_perms:Commun
         return True
     
     # moderators can do everything
-    is_mod = Connector.is_moderator(user_roles)
+    is_mod = Connector.is_moderator(user_roles, guild_id)
     if is_mod:
         return True
 
@@ -5,12 +5,17 @@ import logging
 import traceback
 import sys
 import uuid
+import signal
+import asyncio
 
 from pathlib import Path
 from discord.ext.help import Help, HelpElement, HelpPage
 from discord.ext.servercount import ServerCount
 
 from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
+from lib.SettingsWatcher import SettingsWatcher
+from lib.LeaderElection import LeaderElection
 from lib.Analytics import Analytics, Types
 
 FEEDBACK_CHANNEL = 872104333007785984
@@ -48,7 +53,44 @@ intents.guilds = True # required for member roles -> permissions
 #intents.reactions = True
 #intents.messages = True
 
-bot: discord.AutoShardedBot = discord.AutoShardedBot(intents=intents)
+
+def parse_shard_ids(shard_str: str) -> list:
+    """parse a shard list like '0-3' or '0,2,4'"""
+
+    shard_ids = []
+    for part in shard_str.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            shard_ids.extend(range(int(first), int(last)+1))
+        elif part.strip():
+            shard_ids.append(int(part))
+
+    return shard_ids
+
+
+# cluster mode, each process connects to a subset of the shards
+# and only delivers reminders of guilds on these shards
+shard_count = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+shard_ids = parse_shard_ids(os.getenv('SHARD_IDS')) if os.getenv('SHARD_IDS') else None
+
+if shard_ids and not shard_count:
+    raise ValueError('SHARD_IDS requires SHARD_COUNT to be set')
+
+
+
+class RemindmeBot(discord.AutoShardedBot):
+
+    async def close(self):
+        # drain before disconnecting, running deliveries still require the connection
+        reminder_cog = self.get_cog('ReminderModule')
+        if reminder_cog and not self.is_closed():
+            await reminder_cog.drain()
+
+        await LeaderElection.resign()
+        await super().close()
+
+
+bot: RemindmeBot = RemindmeBot(intents=intents, shard_count=shard_count, shard_ids=shard_ids)
 
 SYNTAX_HELP_PAGE = \
                 'basic example:\n'\
@@ -131,6 +173,8 @@ async def on_ready():
     await bot.change_presence(activity=discord.Game(name='/remindme'))
     log.debug('starting basic statistics loops')
 
+    if not renew_leadership.is_running():
+        renew_leadership.start()
     if not update_community_count.is_running():
         update_community_count.start()
     if not update_experimental_count.is_running():
@@ -186,7 +230,7 @@ async def on_error(event_method, *args, **kwargs):
 
 @bot.event
 async def on_guild_remove(guild):
-    del_rem, del_intvl = Connector.delete_guild(guild.id)
+    del_rem, del_intvl = await AsyncConnector.delete_guild(guild.id)
     
     Analytics.guild_removed()
     Analytics.reminder_deleted(Types.DeleteAction.KICK, count=del_rem)
@@ -201,7 +245,7 @@ async def on_guild_remove(guild):
 async def on_guild_join(guild):
 
     # new guilds do not use the legacy mode
-    Connector.set_legacy_interval(guild.id, False)
+    await AsyncConnector.set_legacy_interval(guild.id, False)
 
     Analytics.guild_added()
     guild_cnt = len(bot.guilds)
@@ -273,36 +317,55 @@ def config_help():
 
 
 
+@tasks.loop(seconds=LeaderElection.RENEW_SECS)
+async def renew_leadership():
+    await LeaderElection.renew()
+
+
 @tasks.loop(hours=6)
 async def update_experimental_count():
-    
+    # collection-wide count, only needed once per cluster
+    if not LeaderElection.is_leader:
+        return
+
     log.debug('updating experimental server count')
-    comm_cnt = Connector.get_experimental_count()
+    comm_cnt = await AsyncConnector.get_experimental_count()
     Analytics.experimental_count(comm_cnt)
 
 
 @tasks.loop(hours=3)
 async def update_community_count():
+    # guilds are counted per process
+    Analytics.guild_cnt(len(bot.guilds))
+
+    # collection-wide count, only needed once per cluster
+    if not LeaderElection.is_leader:
+        return
+
     log.debug('updating anayltics guild/community count')
 
-    comm_cnt = Connector.get_community_count()
+    comm_cnt = await AsyncConnector.get_community_count()
     Analytics.community_count(comm_cnt)
-    Analytics.guild_cnt(len(bot.guilds))
 
 
 @update_community_count.before_loop
 async def update_community_count_before():
     await bot.wait_until_ready()
+    await LeaderElection.renew()
 
 
 @update_experimental_count.before_loop
 async def update_experimental_count_before():
     await bot.wait_until_ready()
+    await LeaderElection.renew()
 
 
 
 def main():
+    Connector.set_shards(shard_count, shard_ids)
     Connector.init()
+    AsyncConnector.init()
+    SettingsWatcher.start()
     Analytics.init()
 
     for filename in os.listdir(Path(__file__).parent / 'cogs'):
@@ -313,7 +376,26 @@ def main():
     bot.load_extension('discord.ext.servercount.servercount')
 
     set_tokens()
-    bot.run(token)
+
+    # bot.run() stops the event loop on a signal without closing the bot,
+    # the reminders in delivery wouldn't be drained
+    loop = bot.loop
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(bot.close()))
+
+    async def runner():
+        try:
+            await bot.start(token)
+        finally:
+            if not bot.is_closed():
+                await bot.close()
+
+    try:
+        loop.run_until_complete(runner())
+    finally:
+        SettingsWatcher.stop()
+        AsyncConnector.shutdown()
+        loop.close()
 
 
 
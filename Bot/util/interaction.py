@@ -4,8 +4,12 @@ import re
 from typing import Union
 
 import discord
+from bson import ObjectId
+from bson.errors import InvalidId
 
 from lib.Connector import Connector, Reminder
+from lib.Reminder import IntervalReminder
+from lib.AsyncConnector import AsyncConnector
 from lib.Analytics import Analytics, Types
 from lib.CommunitySettings import CommunitySettings, CommunityAction
 
@@ -146,81 +150,157 @@ class MulitDropdownView(CustomView):
         self.stop()
 
 
-class UndeliveredView(CustomView):
-    def __init__(self, reminder_id, *args, **kwargs):
-        super().__init__(*args , **kwargs)
-        self.r_id = reminder_id
+class ReminderButtons:
+    """stateless snooze and delete buttons of delivered reminders
+       the custom_id encodes the action and the reminder, no view is kept in memory
+       all clicks are handled by dispatch(), the buttons keep working after a restart
 
+       rm:snooze:<reminder id>:<seconds>:<base timestamp>
+       rm:del:<interval id>      (author only)
+       rm:undel:<reminder id>    (undelivered reminder in the DM of the target)
+    """
 
-    # This one is similar to the confirmation button except sets the inner value to `False`
-    @discord.ui.button(emoji='🗑️', style=discord.ButtonStyle.red)
-    async def cancel(self, button: discord.ui.Button, interaction: discord.Interaction):
+    PREFIX = 'rm'
+    SNOOZE_SECONDS = (15*60, 60*60)
 
-        # modify button colors
-        if not Connector.delete_reminder(self.r_id):
-            Connector.delete_interval(self.r_id)
 
-        self.disable_all()
-        await interaction.response.edit_message(view=self)
+    @staticmethod
+    def get_view(rem: Reminder) -> discord.ui.View:
+        """buttons of a reminder delivered into a channel
 
-        self.value = False
-        self.stop()
+        Args:
+            rem (Reminder): delivered reminder or interval
+        """
 
+        # one-shot reminders are snoozed relative to their due date,
+        # the due date of an interval is already replaced by its next occurrence
+        base = datetime.utcnow() if isinstance(rem, IntervalReminder) else rem.at
+        base_ts = int(base.timestamp())
 
-class SnoozeView(CustomView):
-    def __init__(self, reminder: Reminder, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.reminder = reminder
-        self.r_id = reminder._id
+        view = discord.ui.View(timeout=None)
+        for seconds in ReminderButtons.SNOOZE_SECONDS:
+            view.add_item(discord.ui.Button(label=f'+{seconds//60}m', emoji='⏱️', style=discord.ButtonStyle.blurple,
+                                            custom_id=f'{ReminderButtons.PREFIX}:snooze:{rem._id}:{seconds}:{base_ts}'))
 
+        if isinstance(rem, IntervalReminder):
+            view.add_item(discord.ui.Button(emoji='🗑️', style=discord.ButtonStyle.danger,
+                                            custom_id=f'{ReminderButtons.PREFIX}:del:{rem._id}'))
+
+        return view
+
+
+    @staticmethod
+    def get_undelivered_view(reminder_id) -> discord.ui.View:
+        """delete button of a reminder, which was delivered as DM fallback"""
+
+        view = discord.ui.View(timeout=None)
+        view.add_item(discord.ui.Button(emoji='🗑️', style=discord.ButtonStyle.red,
+                                        custom_id=f'{ReminderButtons.PREFIX}:undel:{reminder_id}'))
+        return view
+
+
+    @staticmethod
+    def release(view: discord.ui.View):
+        """stop tracking a sent view, stopped views are dropped from the view store"""
+        if view:
+            view.stop()
+
+
+    @staticmethod
+    async def dispatch(interaction: discord.Interaction) -> bool:
+        """handle a click onto a reminder button
+
+        Returns:
+            bool: True if the interaction belongs to a reminder button
+        """
+
+        custom_id = (interaction.data or {}).get('custom_id', '')
+        parts = custom_id.split(':')
+
+        if len(parts) < 3 or parts[0] != ReminderButtons.PREFIX:
+            return False
+
+        try:
+            r_id = ObjectId(parts[2])
+        except InvalidId:
+            return False
+
+        if parts[1] == 'snooze' and len(parts) == 5:
+            await ReminderButtons._snooze(interaction, r_id, int(parts[3]), int(parts[4]))
+        elif parts[1] == 'del':
+            await ReminderButtons._delete_interval(interaction, r_id)
+        elif parts[1] == 'undel':
+            await ReminderButtons._delete_undelivered(interaction, r_id)
+        else:
+            return False
+
+        return True
+
+
+    @staticmethod
+    def _get_disabled_view(interaction: discord.Interaction, pressed_style: discord.ButtonStyle) -> discord.ui.View:
+        view = discord.ui.View.from_message(interaction.message, timeout=None)
+
+        for child in view.children:
+            if isinstance(child, discord.ui.Button):
+                pressed = child.custom_id == interaction.data['custom_id']
+                child.style = pressed_style if pressed else discord.ButtonStyle.secondary
+            child.disabled = True
+
+        # a finished view isn't stored by the view store
+        view.stop()
+        return view
+
+
+    @staticmethod
+    async def _snooze(interaction: discord.Interaction, r_id, seconds: int, base_ts: int):
+
+        # delivered reminders are archived for a limited time
+        source = await AsyncConnector.get_snooze_source(r_id)
+        if not source:
+            await interaction.response.send_message('This reminder can\'t be snoozed anymore', ephemeral=True)
+            return
 
-    async def snooze_reminder(self, button: discord.ui.Button, interaction: discord.Interaction, delay_seconds: int):
-        
         # convert to json and back to reminder object
         # this automatically converts intervals to reminders
-        snoozed = Reminder(self.reminder._to_json())
+        snoozed = Reminder(source._to_json())
 
         snoozed._id = None
         snoozed.created_at = datetime.utcnow()
         snoozed.msg = (snoozed.msg+' (snoozed)')[:25]
-        snoozed.at = self.reminder.at + timedelta(seconds=delay_seconds)
-
-        Connector.add_reminder(snoozed)
+        snoozed.at = datetime.fromtimestamp(base_ts) + timedelta(seconds=seconds)
 
-        self.disable_all()
-        button.style = discord.ButtonStyle.green
-
-        await interaction.response.edit_message(view=self)
-        self.stop()
+        await AsyncConnector.add_reminder(snoozed)
 
-    @discord.ui.button(label='+15m', emoji='⏱️', style=discord.ButtonStyle.blurple)
-    async def snooze_15(self, button: discord.ui.Button, interaction: discord.Interaction):
-        await self.snooze_reminder(button, interaction, 15*60)
+        view = ReminderButtons._get_disabled_view(interaction, discord.ButtonStyle.green)
+        await interaction.response.edit_message(view=view)
 
-    @discord.ui.button(label='+60m', emoji='⏱️', style=discord.ButtonStyle.blurple)
-    async def snooze_60(self, button: discord.ui.Button, interaction: discord.Interaction):
-        await self.snooze_reminder(button, interaction, 60*60)
 
-    
+    @staticmethod
+    async def _delete_interval(interaction: discord.Interaction, r_id):
 
-class SnoozeIntervalView(SnoozeView):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        interval = await AsyncConnector.get_interval_by_id(r_id)
 
-    async def delete(self, button: discord.ui.Button, interaction: discord.Interaction):
+        # without the interval the author is unknown, the shared message is left untouched
+        if not interval:
+            await interaction.response.send_message('This reminder doesn\'t exist anymore', ephemeral=True)
+            return
 
-        if interaction.user.id != self.reminder.author:
+        if interaction.user.id != interval.author:
             await interaction.response.send_message('You do not have permissions to delete this reminder', ephemeral=True)
             return
 
-        Connector.delete_interval(self.r_id)
-        self.disable_all()
-        button.style = discord.ButtonStyle.danger
+        await AsyncConnector.delete_interval(r_id)
 
-        await interaction.response.edit_message(view=self, embed=discord.Embed(title='Deleted Reminder', description='The reminder was deleted by its author', color=0x409fe2)) # cyan blue
-        self.stop()
+        view = ReminderButtons._get_disabled_view(interaction, discord.ButtonStyle.danger)
+        await interaction.response.edit_message(view=view, embed=discord.Embed(title='Deleted Reminder', description='The reminder was deleted by its author', color=0x409fe2)) # cyan blue
+
+
+    @staticmethod
+    async def _delete_undelivered(interaction: discord.Interaction, r_id):
 
+        if not await AsyncConnector.delete_reminder(r_id):
+            await AsyncConnector.delete_interval(r_id)
 
-    @discord.ui.button(emoji='🗑️', style=discord.ButtonStyle.danger)
-    async def del_reminder(self, button: discord.ui.Button, interaction: discord.Interaction):
-        await self.delete(button, interaction)
\ No newline at end of file
+        view = ReminderButtons._get_disabled_view(interaction, discord.ButtonStyle.secondary)
+        await interaction.response.edit_message(view=view)
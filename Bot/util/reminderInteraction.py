@@ -13,6 +13,7 @@ import lib.input_parser
 import lib.ReminderRepeater
 from lib.Reminder import Reminder, IntervalReminder
 from lib.Connector import Connector
+from lib.AsyncConnector import AsyncConnector
 from lib.Analytics import Analytics, Types
 
 log = logging.getLogger('Remindme.Listing')
@@ -154,7 +155,7 @@ class ReminderChannelEdit(util.interaction.CustomView):
                 err_eb = discord.Embed(title='Failed to edit Reminder',
                                 description='You must select a Voice- or Text- Channel')
             else:
-                r_type = Connector.get_reminder_type(self.stm.scope.instance_id)
+                r_type = await AsyncConnector.get_reminder_type(self.stm.scope.instance_id)
                 if r_type == Connector.ReminderType.TEXT_ONLY:
                     req_perms = discord.Permissions(send_messages=True)
                     has_perms = util.verboseErrors.VerboseErrors.has_permission(req_perms, new_ch)
@@ -182,7 +183,7 @@ class ReminderChannelEdit(util.interaction.CustomView):
 
                 if view.value:
                     # store the channel change
-                    Connector.set_reminder_channel(self.reminder._id, new_ch_id, new_ch.name)
+                    await AsyncConnector.set_reminder_channel(self.reminder._id, new_ch_id, new_ch.name)
                     # update local reminder obj
                     self.reminder.ch_id = new_ch_id
 
@@ -311,11 +312,11 @@ class EditModal(discord.ui.Modal):
         
         if new_title != self.reminder.title:
             self.reminder.title = new_title
-            Connector.set_reminder_title(self.reminder._id, self.reminder.title)
+            await AsyncConnector.set_reminder_title(self.reminder._id, self.reminder.title)
 
         if new_msg != self.reminder.msg:
             self.reminder.msg = new_msg
-            Connector.set_reminder_message(self.reminder._id, self.reminder.msg)
+            await AsyncConnector.set_reminder_message(self.reminder._id, self.reminder.msg)
 
         if new_imgurl != self.reminder.img_url:
             # check if the given url is actually valid
@@ -326,7 +327,7 @@ class EditModal(discord.ui.Modal):
                 pass
             if success:
                 self.reminder.img_url = new_imgurl
-                Connector.set_reminder_img_url(self.reminder._id, self.reminder.img_url)
+                await AsyncConnector.set_reminder_img_url(self.reminder._id, self.reminder.img_url)
 
 
         if not isinstance(self.reminder, IntervalReminder):
@@ -344,7 +345,7 @@ class EditModal(discord.ui.Modal):
             if parsed_at:
                 new_at_utc = parsed_at.astimezone(tz=tz.UTC).replace(tzinfo=None) if parsed_at.tzinfo else parsed_at
                 self.reminder.at = new_at_utc
-                Connector.update_reminder_at(self.reminder)
+                await AsyncConnector.update_reminder_at(self.reminder)
         else:
             if new_at:
                 # TODO: check if placeholder is assigned to new_at or if None
@@ -434,9 +435,9 @@ class ReminderIntervalAddView(util.interaction.CustomView):
             if view.value:
                 # store to db
                 if mode == RuleMode.RRULE_ADD:
-                    self.reminder = lib.ReminderRepeater.add_rules(self.reminder, rrule=str(rrule))
+                    self.reminder = await AsyncConnector.run(lib.ReminderRepeater.add_rules, self.reminder, rrule=str(rrule))
                 else:
-                    self.reminder = lib.ReminderRepeater.add_rules(self.reminder, exrule=str(rrule))
+                    self.reminder = await AsyncConnector.run(lib.ReminderRepeater.add_rules, self.reminder, exrule=str(rrule))
 
           
         # return to normal view in any case
@@ -488,9 +489,9 @@ class ReminderIntervalAddView(util.interaction.CustomView):
             if view.value:
                 # store the non-localized date to db
                 if mode == RuleMode.DATE_ADD:
-                    self.reminder = lib.ReminderRepeater.add_rules(self.reminder, rdate=date)
+                    self.reminder = await AsyncConnector.run(lib.ReminderRepeater.add_rules, self.reminder, rdate=date)
                 else:
-                    self.reminder = lib.ReminderRepeater.add_rules(self.reminder, exdate=date)
+                    self.reminder = await AsyncConnector.run(lib.ReminderRepeater.add_rules, self.reminder, exdate=date)
 
 
         # return to normal view in any case
@@ -653,7 +654,7 @@ class ReminderIntervalModifyView(util.interaction.CustomView):
 
         if view.value:
             # go aheaad with deletion
-            self.reminder = lib.ReminderRepeater.rm_rules(self.reminder, rule_idx=self.rule_index)
+            self.reminder = await AsyncConnector.run(lib.ReminderRepeater.rm_rules, self.reminder, rule_idx=self.rule_index)
 
             if not self.reminder.at:
                 eb = discord.Embed(title='Orphan warning',
@@ -778,9 +779,9 @@ class ReminderEditView(util.interaction.CustomView):
         await modal.wait()
 
         if isinstance(self.reminder, IntervalReminder):
-            self.reminder = Connector.get_interval_by_id(self.reminder._id)
+            self.reminder = await AsyncConnector.get_interval_by_id(self.reminder._id)
         else:
-            self.reminder = Connector.get_reminder_by_id(self.reminder._id)
+            self.reminder = await AsyncConnector.get_reminder_by_id(self.reminder._id)
 
         eb = self.get_embed()
         await self.message.edit_original_message(embed=eb, view=self)
@@ -806,10 +807,10 @@ class ReminderEditView(util.interaction.CustomView):
         if view.value:
             # delete the reminder
             if isinstance(self.reminder, IntervalReminder):
-                Connector.delete_interval(self.reminder._id)
+                await AsyncConnector.delete_interval(self.reminder._id)
                 Analytics.interval_deleted(Types.DeleteAction.LISTING)
             else:
-                Connector.delete_reminder(self.reminder._id)
+                await AsyncConnector.delete_reminder(self.reminder._id)
                 Analytics.reminder_deleted(Types.DeleteAction.LISTING)
 
             # go back to previous view
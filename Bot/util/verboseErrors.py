@@ -1,9 +1,22 @@
+import os
 import discord
 from enum import Enum
 
+from lib.Cache import LRUCache
+
 
 class VerboseErrors:
 
+    # effective permissions of the bot by (channel, guild version, channel version)
+    # the versions are bumped by gateway events, the ttl covers missed events
+    PERMISSION_CACHE_SIZE = int(os.getenv('PERMISSION_CACHE_SIZE', '20000'))
+    PERMISSION_CACHE_TTL = int(os.getenv('PERMISSION_CACHE_TTL', '600'))
+
+    _permission_cache = LRUCache(maxsize=PERMISSION_CACHE_SIZE, ttl=PERMISSION_CACHE_TTL)
+    # only hold guilds and channels with updates, dropped when they're deleted
+    _guild_versions = {}
+    _channel_versions = {}
+
     @staticmethod
     def _perm_to_readable(perm: str):
         perm = perm.replace('_', ' ').title()
@@ -78,6 +91,60 @@ class VerboseErrors:
         return granted_perms
 
 
+    @staticmethod
+    def get_cached_permissions(channel) -> discord.Permissions:
+        """get the effective permissions of the bot in the channel
+           threads use the permissions of their parent channel
+
+        Args:
+            channel (discord.abc.GuildChannel|discord.Thread): evaluated channel
+
+        Returns:
+            discord.Permissions: permissions including the channel overwrites
+        """
+
+        if isinstance(channel, discord.Thread) and channel.parent:
+            channel = channel.parent
+
+        key = (channel.id, VerboseErrors._guild_versions.get(channel.guild.id, 0), VerboseErrors._channel_versions.get(channel.id, 0))
+
+        perms = VerboseErrors._permission_cache.get(key)
+        if perms is None:
+            perms = channel.permissions_for(channel.guild.me)
+            VerboseErrors._permission_cache.set(key, perms)
+
+        return perms
+
+
+    @staticmethod
+    def invalidate_guild_permissions(guild_id: int):
+        """invalidate all cached permissions of a guild, e.g. after a role update"""
+        VerboseErrors._guild_versions[guild_id] = VerboseErrors._guild_versions.get(guild_id, 0) + 1
+
+
+    @staticmethod
+    def invalidate_channel_permissions(channel_id: int):
+        """invalidate the cached permissions of a channel, e.g. after an overwrite update"""
+        VerboseErrors._channel_versions[channel_id] = VerboseErrors._channel_versions.get(channel_id, 0) + 1
+
+
+    @staticmethod
+    def forget_channel(channel_id: int):
+        """drop the version of a deleted channel, its cached permissions expire on their own"""
+        VerboseErrors._channel_versions.pop(channel_id, None)
+
+
+    @staticmethod
+    def forget_guild(guild: discord.Guild):
+        """drop the versions of a guild the bot was removed from
+           a stale permission cached before the first invalidation can only be hit
+           if the bot rejoins within the cache ttl, a failed send invalidates it
+        """
+        VerboseErrors._guild_versions.pop(guild.id, None)
+        for channel in guild.channels:
+            VerboseErrors._channel_versions.pop(channel.id, None)
+
+
     @staticmethod
     def get_manage_messages_perms():
         """get Permissions obj for managing messages
@@ -119,7 +186,7 @@ class VerboseErrors:
         return discord.Permissions(send_messages=True, read_messages=True)
 
     @staticmethod
-    def can_send_messages(channel: discord.TextChannel, channel_overwrite = True, granted_perms: discord.Permissions = None, user_override = None):
+    def can_send_messages(channel: discord.TextChannel, channel_overwrite = True, granted_perms: discord.Permissions = None, user_override = None, cached = False):
         """shortcut for has_permissions with send_messages
 
         Args:
@@ -127,6 +194,7 @@ class VerboseErrors:
             channel_overwrite (bool, optional): apply channel overwrite (for bot user). Defaults to True.
             granted_perms (discord.Permissions): override guild permissions of 'channel' of not None. Defaults to None
             user_override (discord.Member): evaluate permissions for the given user, not for the bot. Defaults to None (=Bot)
+            cached (bool, optional): use the permission cache, only applies to the bot with channel overwrites. Defaults to False.
 
         Returns:
             [type]: true, if requested permissions are granted
@@ -135,7 +203,8 @@ class VerboseErrors:
                     channel = channel, 
                     channel_overwrite= channel_overwrite, 
                     granted_perms = granted_perms,
-                    user_override=user_override)
+                    user_override=user_override,
+                    cached=cached)
 
     @staticmethod
     def get_embed_perms():
@@ -147,7 +216,7 @@ class VerboseErrors:
         return discord.Permissions(embed_links=True, send_messages=True, read_messages=True)
 
     @staticmethod
-    def can_embed(channel: discord.TextChannel, channel_overwrite = True, granted_perms: discord.Permissions = None, user_override = None):
+    def can_embed(channel: discord.TextChannel, channel_overwrite = True, granted_perms: discord.Permissions = None, user_override = None, cached = False):
         """shortcut for has_permissions with embed_links
 
         Args:
@@ -155,6 +224,7 @@ class VerboseErrors:
             channel_overwrite (bool, optional): apply channel overwrite (for bot user). Defaults to True.
             granted_perms (discord.Permissions): override guild permissions of 'channel' of not None. Defaults to None
             user_override (discord.Member): evaluate permissions for the given user, not for the bot. Defaults to None (=Bot)
+            cached (bool, optional): use the permission cache, only applies to the bot with channel overwrites. Defaults to False.
 
         Returns:
             [type]: true, if requested permissions are granted
@@ -164,7 +234,8 @@ class VerboseErrors:
                     channel = channel, 
                     channel_overwrite= channel_overwrite, 
                     granted_perms = granted_perms,
-                    user_override=user_override)
+                    user_override=user_override,
+                    cached=cached)
 
 
     @staticmethod
@@ -198,7 +269,7 @@ class VerboseErrors:
 
 
     @staticmethod
-    def has_permission(wanted_perms: discord.Permissions, channel: discord.TextChannel, channel_overwrite = True, granted_perms: discord.Permissions = None, user_override = None):
+    def has_permission(wanted_perms: discord.Permissions, channel: discord.TextChannel, channel_overwrite = True, granted_perms: discord.Permissions = None, user_override = None, cached = False):
         """determin if bot has requested permissions (in a specific channel)
 
         Args:
@@ -207,11 +278,16 @@ class VerboseErrors:
             channel_overwrite (bool, optional): apply channel overwrite (for bot user). Defaults to True.
             granted_perms (discord.Permissions): override guild permissions of 'channel' of not None. Defaults to None
             user_override (discord.Member): evaluate permissions for the given user, not for the bot. Defaults to None (=Bot)
+            cached (bool, optional): use the permission cache, only applies to the bot with channel overwrites. Defaults to False.
 
         Returns:
             [type]: true, if requested permissions are granted
         """
 
+        if cached and channel_overwrite and not granted_perms and not user_override:
+            effective = VerboseErrors.get_cached_permissions(channel)
+            return (wanted_perms <= effective) or effective.administrator
+
         if not granted_perms:
             granted_perms = channel.guild.me.guild_permissions
 
@@ -6,6 +6,12 @@ import unit_tests.TimezoneParseTest as TPT
 import unit_tests.AbsParseTest as AbPT
 import unit_tests.CombineParseTest as CPT
 import unit_tests.IntervalTest as ITT
+import unit_tests.CacheTest as CaT
+import unit_tests.SchedulerTest as ST
+import unit_tests.DeliveryPoolTest as DPT
+import unit_tests.RateLimiterTest as RLT
+import unit_tests.ConnectorTest as CoT
+import unit_tests.DeliveryQueueTest as DQT
 
 
 if __name__ == '__main__':
@@ -17,4 +23,10 @@ if __name__ == '__main__':
     main(module=TPT, exit=False)
     main(module=CPT, exit=False)
     main(module=ITT, exit=False)
+    main(module=CaT, exit=False)
+    main(module=ST, exit=False)
+    main(module=DPT, exit=False)
+    main(module=RLT, exit=False)
+    main(module=CoT, exit=False)
+    main(module=DQT, exit=False)
     
\ No newline at end of file
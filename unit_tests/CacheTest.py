@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+
+from Bot.lib.Cache import LRUCache
+
+
+
+class CacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache(maxsize=3, ttl=10)
+
+
+    def test_get_set(self):
+        self.cache.set('a', 1)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('b', 2), 2)
+
+
+    def test_lru_eviction(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.set('c', 3)
+
+        # 'a' is now the most recently used entry
+        self.cache.get('a')
+        self.cache.set('d', 4)
+
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(len(self.cache), 3)
+
+
+    def test_ttl(self):
+        with patch('Bot.lib.Cache.time.monotonic', return_value=100):
+            self.cache.set('a', 1)
+            self.cache.set('b', 2, ttl=60)
+
+        with patch('Bot.lib.Cache.time.monotonic', return_value=120):
+            self.assertIsNone(self.cache.get('a'))
+            self.assertEqual(self.cache.get('b'), 2)
+
+
+    def test_pop_clear(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+
+        self.assertEqual(self.cache.pop('a'), 1)
+        self.assertIsNone(self.cache.pop('a'))
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+
+    def test_cached_none(self):
+        # None is a valid value, e.g. for negative lookups
+        self.cache.set('a', None)
+        self.assertIn('a', self.cache)
@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime, timedelta
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+# imported like the bot does, the Reminder module refers to lib.Connector
+from lib.Connector import Connector
+
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class ConnectorTest(unittest.TestCase):
+
+    def setUp(self):
+        Connector.client = mongomock.MongoClient()
+        Connector.db = Connector.client.reminderBot
+        Connector.shard_ids = None
+
+        self.now = datetime.utcnow().replace(microsecond=0)
+
+
+    def test_restore_rescheduled_interval(self):
+        due_at = self.now - timedelta(minutes=1)
+        rescheduled_at = self.now + timedelta(days=1)
+        Connector.db.intervals.insert_one({'_id': 1, 'at': rescheduled_at.timestamp()})
+
+        self.assertEqual(Connector.restore_interval_at([(1, rescheduled_at, due_at)]), 1)
+
+        # stored as timestamp, the numeric queries must still match
+        at = Connector.db.intervals.find_one({'_id': 1})['at']
+        self.assertIsInstance(at, float)
+        self.assertEqual(at, due_at.timestamp())
+
+
+    def test_restore_orphaned_interval(self):
+        due_at = self.now - timedelta(minutes=1)
+        Connector.db.intervals.insert_one({'_id': 2, 'at': None})
+
+        self.assertEqual(Connector.restore_interval_at([(2, None, due_at)]), 1)
+        self.assertEqual(Connector.db.intervals.find_one({'_id': 2})['at'], due_at.timestamp())
+
+
+    def test_restore_skips_edited_interval(self):
+        due_at = self.now - timedelta(minutes=1)
+        rescheduled_at = self.now + timedelta(days=1)
+        edited_at = (self.now + timedelta(hours=3)).timestamp()
+        Connector.db.intervals.insert_one({'_id': 3, 'at': edited_at})
+
+        self.assertEqual(Connector.restore_interval_at([(3, rescheduled_at, due_at)]), 0)
+        self.assertEqual(Connector.db.intervals.find_one({'_id': 3})['at'], edited_at)
+
+
+    def test_upcoming_at_leases(self):
+        now_ts = self.now.timestamp()
+        Connector.db.reminders.insert_many([
+            {'_id': 1, 'at': now_ts - 60},
+            # waiting for a retry within the window
+            {'_id': 2, 'at': now_ts - 120, 'lease_until': now_ts + 30},
+            # claimed beyond the window
+            {'_id': 3, 'at': now_ts - 180, 'lease_until': now_ts + 3600},
+            # expired lease
+            {'_id': 4, 'at': now_ts - 240, 'lease_until': now_ts - 10},
+        ])
+
+        upcoming = Connector.get_upcoming_at(now_ts + 600)
+        self.assertCountEqual(upcoming, [now_ts - 60, now_ts + 30, now_ts - 240])
+
+
+    def test_take_checkpoints_resplit(self):
+        Connector.shard_ids = [0, 1, 2, 3]
+        Connector.save_checkpoint([1, 2], [3])
+
+        Connector.shard_ids = [4, 5]
+        self.assertEqual(Connector.take_checkpoints(), ([], []))
+
+        # the shards were re-split, the checkpoint overlaps
+        Connector.shard_ids = [0, 1]
+        self.assertEqual(Connector.take_checkpoints(), ([1, 2], [3]))
+        self.assertEqual(Connector.take_checkpoints(), ([], []))
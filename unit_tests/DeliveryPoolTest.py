@@ -0,0 +1,56 @@
+import unittest
+import asyncio
+
+from Bot.lib.DeliveryPool import DeliveryPool
+
+
+
+class DeliveryPoolTest(unittest.TestCase):
+
+    def test_concurrency_limit(self):
+        pool = DeliveryPool(concurrency=3)
+        peak = 0
+
+        async def deliver(item):
+            nonlocal peak
+            peak = max(peak, pool.in_flight)
+            await asyncio.sleep(0.01)
+
+        failed = asyncio.run(pool.run(list(range(20)), deliver))
+
+        self.assertEqual(failed, 0)
+        self.assertEqual(peak, 3)
+
+
+    def test_key_order(self):
+        pool = DeliveryPool(concurrency=10)
+        delivered = []
+
+        async def deliver(item):
+            # later items of a channel finish faster
+            await asyncio.sleep(0.01 * (5 - item[1]))
+            delivered.append(item)
+
+        items = [('a', i) for i in range(5)] + [('b', i) for i in range(5)]
+        asyncio.run(pool.run(items, deliver, key=lambda item: item[0]))
+
+        self.assertEqual([i for i in delivered if i[0] == 'a'], items[:5])
+        self.assertEqual([i for i in delivered if i[0] == 'b'], items[5:])
+
+
+    def test_failures(self):
+        pool = DeliveryPool(concurrency=2)
+        errors = []
+        delivered = []
+
+        async def deliver(item):
+            if item % 2:
+                raise ValueError(item)
+            delivered.append(item)
+
+        failed = asyncio.run(pool.run(list(range(6)), deliver, key=lambda item: 0,
+                                      on_error=lambda item, e: errors.append(item)))
+
+        self.assertEqual(failed, 3)
+        self.assertEqual(errors, [1, 3, 5])
+        self.assertEqual(delivered, [0, 2, 4])
@@ -0,0 +1,181 @@
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import dateutil.rrule as rr
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+# imported like the bot does, the Reminder module refers to lib.Connector
+from lib.Connector import Connector
+from lib.Reminder import IntervalReminder
+import cogs.ReminderModule as rm
+
+
+
+@unittest.skipIf(mongomock is None, 'mongomock is not installed')
+class DeliveryQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        Connector.client = mongomock.MongoClient()
+        Connector.db = Connector.client.reminderBot
+        Connector.shard_ids = None
+
+        self.now_ts = datetime.utcnow().timestamp()
+
+
+    def _insert(self, _id, at_offset, **kwargs):
+        Connector.db.reminders.insert_one({'_id': _id, 'at': self.now_ts + at_offset,
+                                           'author': 1, 'target': 1, 'msg': str(_id), **kwargs})
+
+
+    def test_claim_batch(self):
+        self._insert(1, -30)
+        self._insert(2, -20)
+        self._insert(3, -10)
+        self._insert(4, 600)
+
+        claimed = Connector.claim_elapsed_reminders(self.now_ts, limit=2, lease_secs=60)
+        self.assertEqual([r._id for r in claimed], [1, 2])
+
+        # leased reminders aren't claimed again
+        claimed = Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60)
+        self.assertEqual([r._id for r in claimed], [3])
+        self.assertEqual(Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60), [])
+
+
+    def test_claim_expired_lease(self):
+        self._insert(1, -30, claimed_by='other', lease_until=self.now_ts + 60)
+        self._insert(2, -20, claimed_by='other', lease_until=self.now_ts - 1)
+
+        claimed = Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60)
+        self.assertEqual([r._id for r in claimed], [2])
+
+
+    def test_ack_archives_guild_reminders(self):
+        self._insert(1, -30, g_id=10, ch_id=20)
+        self._insert(2, -20)
+        Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60)
+
+        self.assertTrue(Connector.ack_reminder(1))
+        self.assertTrue(Connector.ack_reminder(2))
+        self.assertEqual(Connector.db.reminders.count_documents({}), 0)
+
+        # only channel messages have snooze buttons
+        self.assertEqual([d['_id'] for d in Connector.db.delivered.find()], [1])
+        self.assertEqual(Connector.get_snooze_source(1)._id, 1)
+        self.assertIsNone(Connector.get_snooze_source(2))
+
+
+    def test_ack_foreign_lease(self):
+        self._insert(1, -30, claimed_by='other', lease_until=self.now_ts + 60)
+
+        self.assertFalse(Connector.ack_reminder(1))
+        self.assertEqual(Connector.db.reminders.count_documents({}), 1)
+
+
+    def test_retry(self):
+        self._insert(1, -30)
+        Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60)
+
+        self.assertTrue(Connector.retry_reminder(1, 120, 'HTTPException: 503'))
+
+        doc = Connector.db.reminders.find_one({'_id': 1})
+        self.assertEqual(doc['attempts'], 1)
+        self.assertGreaterEqual(doc['lease_until'], self.now_ts + 120)
+
+        # not claimable before the retry is due
+        self.assertEqual(Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60), [])
+        Connector.db.reminders.update_one({'_id': 1}, {'$set': {'lease_until': self.now_ts - 1}})
+        self.assertEqual(len(Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60)), 1)
+
+
+    def test_retry_delay(self):
+        for attempts in range(8):
+            delay = rm.ReminderModule._retry_delay(attempts)
+            now_ts = datetime.utcnow().timestamp()
+
+            self.assertGreater(delay, 0)
+            self.assertLessEqual(delay, rm.RETRY_MAX_SECS + rm.RETRY_SLOT_SECS)
+            # aligned to a retry slot
+            self.assertAlmostEqual((now_ts + delay) % rm.RETRY_SLOT_SECS, 0, delta=0.5)
+
+
+    def test_dead_letter(self):
+        self._insert(1, -30, attempts=4)
+        rem = Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60)[0]
+
+        self.assertTrue(Connector.dead_letter_reminder(rem, 'HTTPException: 503'))
+        self.assertEqual(Connector.db.reminders.count_documents({}), 0)
+
+        doc = Connector.db.dead_letters.find_one({'_id': 1})
+        self.assertEqual(doc['attempts'], 5)
+        self.assertEqual(doc['last_error'], 'HTTPException: 503')
+
+
+    def test_drain_release(self):
+        self._insert(1, -30)
+        self._insert(2, -20)
+        claimed = Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=300)
+
+        # a drained worker returns its undelivered reminders immediately
+        self.assertEqual(Connector.release_reminders([r._id for r in claimed]), 2)
+        self.assertEqual(len(Connector.claim_elapsed_reminders(self.now_ts, limit=10, lease_secs=60)), 2)
+
+        # the checkpoint is handed to a single successor
+        Connector.save_checkpoint([1, 2], [5])
+        self.assertEqual(Connector.take_checkpoints(), ([1, 2], [5]))
+        self.assertEqual(Connector.take_checkpoints(), ([], []))
+
+
+
+class UpcomingTest(unittest.TestCase):
+
+    def setUp(self):
+        rule = rr.rrule(rr.DAILY, dtstart=datetime(2021, 1, 1, 9))
+        self.interval = IntervalReminder({'_id': 1, 'author': 1, 'target': 1, 'msg': 'daily',
+                                          'first_at': datetime(2021, 1, 1, 9).timestamp(),
+                                          'rrules': [str(rule)]})
+        self.utcnow = datetime(2021, 1, 1, 12)
+
+
+    def test_served_from_cache(self):
+        self.assertEqual(self.interval.next_trigger(self.utcnow, tz_str='UTC', legacy_mode=False), datetime(2021, 1, 2, 9))
+        self.assertEqual(len(self.interval.upcoming), IntervalReminder.UPCOMING_CNT)
+
+        # the following occurrences don't evaluate the rules again
+        with patch.object(IntervalReminder, '_get_occurrences', side_effect=AssertionError('recalculated')):
+            at = self.interval.next_trigger(datetime(2021, 1, 3, 12), tz_str='UTC', legacy_mode=False)
+
+        self.assertEqual(at, datetime(2021, 1, 4, 9))
+
+
+    def test_settings_change(self):
+        self.interval.next_trigger(self.utcnow, tz_str='UTC', legacy_mode=False)
+
+        # a new timezone invalidates the precomputed occurrences
+        at = self.interval.next_trigger(self.utcnow, tz_str='Europe/Berlin', legacy_mode=False)
+        self.assertEqual(at, datetime(2021, 1, 2, 8))
+
+
+    def test_refill(self):
+        self.interval.next_trigger(self.utcnow, tz_str='UTC', legacy_mode=False)
+        self.interval.next_trigger(datetime(2021, 1, 9, 12), tz_str='UTC', legacy_mode=False)
+
+        self.assertTrue(self.interval.needs_refill())
+
+        self.interval.refill_upcoming(tz_str='UTC', legacy_mode=False)
+        self.assertFalse(self.interval.needs_refill())
+        self.assertEqual(len(self.interval.upcoming), IntervalReminder.UPCOMING_CNT)
+        self.assertEqual(self.interval.upcoming[-1], datetime(2021, 1, 19, 9))
+
+
+    def test_json_roundtrip(self):
+        self.interval.next_trigger(self.utcnow, tz_str='UTC', legacy_mode=False)
+        restored = IntervalReminder(self.interval._to_json())
+
+        self.assertEqual(restored.upcoming, self.interval.upcoming)
+        self.assertEqual(restored.upcoming_key, self.interval.upcoming_key)
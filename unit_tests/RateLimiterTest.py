@@ -0,0 +1,70 @@
+import unittest
+import asyncio
+
+from Bot.lib.RateLimiter import TokenBucket, RateLimiter
+
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_bucket_reserve(self):
+        bucket = TokenBucket(rate=2, burst=2)
+
+        self.assertEqual(bucket.reserve(now=bucket.updated), 0)
+        self.assertEqual(bucket.reserve(now=bucket.updated), 0)
+        # empty, next token in 0.5s, the one after in 1s
+        self.assertAlmostEqual(bucket.reserve(now=bucket.updated), 0.5)
+        self.assertAlmostEqual(bucket.reserve(now=bucket.updated), 1.0)
+
+
+    def test_bucket_refill(self):
+        bucket = TokenBucket(rate=1, burst=3)
+        t0 = bucket.updated
+
+        for _ in range(3):
+            bucket.reserve(now=t0)
+
+        self.assertFalse(bucket.is_idle(now=t0 + 1))
+        # capped at the burst size
+        self.assertTrue(bucket.is_idle(now=t0 + 100))
+        self.assertEqual(bucket.tokens, 3)
+
+
+    def test_routes_independent(self):
+        limiter = RateLimiter({'channel': (10, 1)}, global_limit=(1000, 1000))
+
+        async def run():
+            waits = []
+            for ch_id in (1, 2, 1):
+                waits.append(await limiter.acquire([('channel', ch_id)]))
+            return waits
+
+        waits = asyncio.run(run())
+
+        # second channel isn't delayed by the first one
+        self.assertLess(waits[1], 0.05)
+        self.assertGreater(waits[2], 0.05)
+        self.assertEqual(limiter.queued, 0)
+
+
+    def test_global_limit(self):
+        limiter = RateLimiter({'channel': (1000, 1000)}, global_limit=(20, 1))
+
+        async def run():
+            return await asyncio.gather(*(limiter.acquire([('channel', i)]) for i in range(3)))
+
+        waits = asyncio.run(run())
+        self.assertGreater(max(waits), 0.08)
+
+
+    def test_prune(self):
+        limiter = RateLimiter({'channel': (1000, 1)}, global_limit=(1000, 1000), max_routes=2)
+
+        async def run():
+            for ch_id in range(5):
+                await limiter.acquire([('channel', ch_id)])
+            await asyncio.sleep(0.01)
+            await limiter.acquire([('channel', 5)])
+
+        asyncio.run(run())
+        self.assertLessEqual(len(limiter._buckets), 2)
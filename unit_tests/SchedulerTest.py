@@ -0,0 +1,66 @@
+import unittest
+import asyncio
+import threading
+
+from Bot.lib.Scheduler import Scheduler
+
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.scheduler.refill([30, 10, 20], horizon=100)
+
+
+    def test_refill_order(self):
+        self.assertEqual(self.scheduler.next_deadline(), 10)
+        self.assertEqual(len(self.scheduler), 3)
+
+        # duplicates are merged
+        self.scheduler.refill([10, 40], horizon=200)
+        self.assertEqual(len(self.scheduler), 4)
+        self.assertEqual(self.scheduler.horizon, 200)
+
+
+    def test_pop_due(self):
+        self.assertEqual(self.scheduler.pop_due(5), 0)
+        self.assertEqual(self.scheduler.pop_due(20), 2)
+        self.assertEqual(self.scheduler.next_deadline(), 30)
+
+
+    def test_schedule_horizon(self):
+        self.scheduler.schedule(5)
+        self.scheduler.schedule(150)
+        self.scheduler.schedule(None)
+
+        # 150 is loaded by the next refill
+        self.assertEqual(self.scheduler.next_deadline(), 5)
+        self.assertEqual(len(self.scheduler), 4)
+
+
+    def test_wait_deadline(self):
+        async def run():
+            self.scheduler.bind(asyncio.get_running_loop())
+            await self.scheduler.wait(now_ts=9.95, max_sleep=10)
+
+        # wakes up at the deadline, not after max_sleep
+        asyncio.run(asyncio.wait_for(run(), timeout=2))
+
+
+    def test_wait_schedule_from_thread(self):
+        async def run():
+            self.scheduler.bind(asyncio.get_running_loop())
+            threading.Timer(0.05, self.scheduler.schedule, args=(1,)).start()
+            await self.scheduler.wait(now_ts=0, max_sleep=10)
+
+        # an earlier trigger time wakes the waiting scheduler
+        asyncio.run(asyncio.wait_for(run(), timeout=2))
+
+
+    def test_stale_horizon(self):
+        self.assertFalse(self.scheduler.is_stale(50))
+        self.assertTrue(self.scheduler.is_stale(100))
+
+        self.scheduler.refill([], horizon=300)
+        self.assertFalse(self.scheduler.is_stale(100))